@@ -0,0 +1,145 @@
+from compiler.program import FPQAProgram
+from nac.config import FPQAConfig, defaults
+from nac.parameter import Parameter
+from pysat.formula import CNF
+import glob
+import hashlib
+import json
+import os
+
+_SOURCE_PACKAGES = ("compiler", "nac")
+# the modules outside these packages that the compile path runs (colorings, cost terms)
+_SOURCE_MODULES = ("utils/sat_utils.py", "utils/hamiltonians.py")
+_compiler_version = None
+
+def compiler_version() -> str:
+    # hash of the compiler's sources, entries written by other code are never read
+    global _compiler_version
+    if _compiler_version is None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digest = hashlib.sha256()
+        filenames = [filename for package in _SOURCE_PACKAGES
+                     for filename in sorted(glob.glob(os.path.join(root, package, "**", "*.py"), recursive=True))]
+        filenames += [os.path.join(root, module) for module in _SOURCE_MODULES]
+        for filename in filenames:
+            digest.update(os.path.relpath(filename, root).encode())
+            with open(filename, "rb") as f:
+                digest.update(f.read())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+def canonical_value(value: float | int | Parameter) -> list | float:
+    if isinstance(value, Parameter):
+        return ["parameter", value.name]
+    return float(value)
+
+def formula_key(formula: CNF) -> dict:
+    # clauses as written, the compiled program depends on the order of the clauses and their literals
+    return {"nv": formula.nv, "clauses": [list(map(int, clause)) for clause in formula.clauses]}
+
+def config_key(config: FPQAConfig) -> dict:
+    return {key: float(getattr(config, key)) for key in defaults}
+
+def cache_key(kind: str, **fields) -> str:
+    fields = dict(fields, kind=kind, version=compiler_version())
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+class CompilationCache:
+    # content addressed store of colorings and compiled programs in a directory, entries are
+    # written atomically so that concurrent compilers can share it, the least recently used
+    # ones are evicted once the directory grows beyond max_size bytes
+    def __init__(self, directory: str, max_size: int = 1 << 30):
+        if max_size <= 0:
+            raise ValueError(f"Cache size must be positive, got {max_size}.")
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}{extension}")
+
+    def _hit(self, path: str) -> bool:
+        # the modification time of an entry records its last use
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _store(self, path: str, write):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(temporary)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        # (last use, size, path) of every entry, least recently used first
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_coloring(self, key: str) -> tuple[int, list[int]] | None:
+        path = self._path(key, ".json")
+        if not self._hit(path):
+            return None
+        # a concurrent compiler may evict the entry between the hit and the read
+        try:
+            with open(path) as f:
+                num_colors, color_map = json.load(f)
+        except FileNotFoundError:
+            return None
+        return num_colors, color_map
+
+    def put_coloring(self, key: str, coloring: tuple[int, list[int]]):
+        num_colors, color_map = coloring
+        def write(path: str):
+            with open(path, "w") as f:
+                json.dump([int(num_colors), [int(color) for color in color_map]], f)
+        self._store(self._path(key, ".json"), write)
+
+    def get_program(self, key: str, config: FPQAConfig, parameters: list[Parameter] | None = None) -> FPQAProgram | None:
+        # the program shares the given config and parameters like a freshly compiled one
+        path = self._path(key, ".fpqa")
+        if not self._hit(path):
+            return None
+        try:
+            program = FPQAProgram.load(path, parameters=parameters)
+        except FileNotFoundError:
+            return None
+        program.fpqa.config = config
+        return program
+
+    def put_program(self, key: str, program: FPQAProgram):
+        self._store(self._path(key, ".fpqa"), program.save)
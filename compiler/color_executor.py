@@ -3,6 +3,7 @@ from compiler.color_mapper import Max3satQaoaMapper
 from pysat.formula import CNF
 from nac.fpqa import FPQA
 from nac.atom import Atom
+from nac.parameter import Parameter
 from utils.hamiltonians import Max3satHamiltonian
 from nac.instructions.raman import GlobalRaman, LocalRaman
 from nac.instructions.rydberg import Rydberg
@@ -19,8 +20,11 @@ class Max3satQaoaExecutor:
         self.program = program
         self.hamiltonian = Max3satHamiltonian(formula=formula)
         # TO-DO: Optimize fidelity in single/quadratic terms
+        self.reset_layer()
+
+    def reset_layer(self):
         self.quadratic_terms = {}
-        self.linear_terms = {atom.id: 0.0 for atom in fpqa.atoms}
+        self.linear_terms = {atom.id: 0.0 for atom in self.fpqa.atoms}
 
     def _get_slm_qubit_errors(self, aod_pairs: list[tuple[Atom, Atom]], slm_atoms: list[Atom], clauses: list[list[int]]) -> list[float]:
         atom_map, rev_atom_map = self.mapper.get_atom_map()
@@ -94,7 +98,7 @@ class Max3satQaoaExecutor:
         parallel = Parallel(instructions)
         self.program.add_instruction(parallel)
 
-    def _implement_quadratic_terms(self, aod_pairs: list[tuple[Atom, Atom]], slm_atoms: list[Atom], clauses: list[list[int]], parameter: float):
+    def _implement_quadratic_terms(self, aod_pairs: list[tuple[Atom, Atom]], slm_atoms: list[Atom], clauses: list[list[int]], parameter: float | Parameter):
         atom_map, rev_atom_map = self.mapper.get_atom_map()
         aod_slm_quadratic_terms = self.mapper.get_aod_slm_quadratic_terms()
         pairs = []
@@ -161,11 +165,11 @@ class Max3satQaoaExecutor:
             self.linear_terms[aod_pairs[i][0].id] += -literal_sign[rev_atom_map[aod_pairs[i][0].id]]
             self.linear_terms[aod_pairs[i][1].id] += -literal_sign[rev_atom_map[aod_pairs[i][1].id]]
 
-    def implement_linear_terms(self, parameter: float):
+    def implement_linear_terms(self, parameter: float | Parameter):
         for atom in self.fpqa.atoms:
             self.program.add_instruction(LocalRaman(self.fpqa, atom, 0.0, 0.0, 2.0 * self.linear_terms[atom.id] * parameter))            
     
-    def execute_color(self, color: int, parameter: float):
+    def execute_color(self, color: int, parameter: float | Parameter):
         atom_map, rev_atom_map = self.mapper.get_atom_map()
         color_groups = self.mapper.color_groups
         clauses = color_groups[color]
@@ -5,8 +5,8 @@ from utils.sat_utils import get_color_map
 from math import ceil
 
 class Max3satQaoaMapper:
-    def __init__(self, fpqa: FPQA, formula: CNF):
-        num_colors, color_map = get_color_map(formula)
+    def __init__(self, fpqa: FPQA, formula: CNF, graph: tuple | None = None, coloring: tuple[int, list[int]] | None = None):
+        num_colors, color_map = coloring if coloring is not None else get_color_map(formula, graph)
         self.fpqa = fpqa
         self.formula = formula
         self.num_colors = num_colors
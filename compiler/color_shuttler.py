@@ -2,18 +2,115 @@ from nac.fpqa import FPQA
 from nac.atom import Atom
 from nac.instructions.base import Instruction
 from nac.instructions.shuttle import Shuttle
+from nac.instructions.multi_shuttle import MultiShuttle
 from nac.instructions.parallel import Parallel
 from nac.instructions.trap_transfer import TrapTransfer
 from compiler.color_mapper import Max3satQaoaMapper
 from compiler.program import FPQAProgram
 from pysat.formula import CNF
+import numpy as np
+
+SHUTTLING_POLICIES = ("greedy", "chains")
+
+def _room(last_x: float, idle: int, spacing: float) -> np.ndarray:
+    # x of the idle columns following a column at last_x, each spacing left of the one before,
+    # entry k is the largest x a column after k idle ones reaches (entry 0 is last_x)
+    return np.subtract.accumulate(np.concatenate(([last_x], np.full(idle, spacing))))
+
+def _plan_columns(start_x: float, candidates: np.ndarray, spacing: float) -> tuple[np.ndarray, np.ndarray]:
+    # target x of the aod columns of a round, right to left: a column reaches its candidate
+    # x (nan for none) unless it lies right of the _room the columns before leave, otherwise
+    # it stays spacing left of the column before
+    # returns the targets and which columns reached their candidate
+    targets = np.empty(len(candidates))
+    reached = np.zeros(len(candidates), dtype=bool)
+    last_x, start = start_x, 0
+    for j, x in zip(np.flatnonzero(~np.isnan(candidates)).tolist(), candidates[~np.isnan(candidates)].tolist()):
+        if j > start:
+            targets[start:j] = _room(last_x, j - start, spacing)[1:]
+            last_x = float(targets[j - 1])
+        if x > last_x:
+            last_x -= spacing
+        else:
+            last_x = x
+            reached[j] = True
+        targets[j] = last_x
+        start = j + 1
+    if len(candidates) > start:
+        targets[start:] = _room(last_x, len(candidates) - start, spacing)[1:]
+    return targets, reached
+
+def _minimum_rounds(start_x: float, candidates: np.ndarray, spacing: float) -> list[list[int]]:
+    # splits the columns with a candidate into the fewest rounds that _plan_columns reaches in
+    # full: a round is a path of columns from right to left in which every column lies within
+    # the _room its predecessor leaves, so the fewest rounds are a minimum path cover of that
+    # dag, the number of columns less a maximum matching of every column with a successor
+    # the matching starts from the rounds of the greedy sweeps, which are kept when no
+    # augmenting path exists, and the rounds are taken in the order of the sweeps
+    # returns the positions of the rounds' columns in the given (right to left) order
+    positions = np.flatnonzero(~np.isnan(candidates)).tolist()
+    xs = candidates[positions]
+    if np.any(xs > _room(start_x, len(candidates), spacing)[positions]):
+        raise ValueError("Something wrong occurred in shuttler!")
+    successors = []
+    for i, j in enumerate(positions):
+        room = _room(float(xs[i]), len(candidates) - j, spacing)
+        later = np.array(positions[i + 1:], dtype=np.int64)
+        successors.append((i + 1 + np.flatnonzero(xs[i + 1:] <= room[later - j - 1])).tolist())
+    # the successor matched to every column and its predecessor
+    successor, predecessor = [-1] * len(positions), [-1] * len(positions)
+    index = {j: i for i, j in enumerate(positions)}
+    sweep, remaining, num_sweeps = [0] * len(positions), candidates.copy(), 0
+    while not np.all(np.isnan(remaining)):
+        reached = np.flatnonzero(_plan_columns(start_x, remaining, spacing)[1]).tolist()
+        for j in reached:
+            sweep[index[j]] = num_sweeps
+        num_sweeps += 1
+        for u, v in zip(reached, reached[1:]):
+            successor[index[u]], predecessor[index[v]] = index[v], index[u]
+        remaining[reached] = np.nan
+    # kuhn's augmenting paths from the columns without a successor
+    for i in range(len(positions)):
+        if successor[i] >= 0:
+            continue
+        # columns on the path with the successor each one takes over
+        visited, path, stack = set(), [], [iter(successors[i])]
+        u = i
+        while len(stack) > 0:
+            v = next((v for v in stack[-1] if v not in visited), None)
+            if v is None:
+                stack.pop()
+                if len(path) > 0:
+                    u = path.pop()[0]
+                continue
+            visited.add(v)
+            path.append((u, v))
+            if predecessor[v] < 0:
+                for u, v in path:
+                    successor[u], predecessor[v] = v, u
+                break
+            u = predecessor[v]
+            stack.append(iter(successors[u]))
+    rounds = []
+    for i in sorted(range(len(positions)), key=lambda i: (sweep[i], i)):
+        if predecessor[i] < 0:
+            rounds.append([])
+            while i >= 0:
+                rounds[-1].append(positions[i])
+                i = successor[i]
+    return rounds
 
 class Max3satQaoaShuttler:
-    def __init__(self, fpqa: FPQA, mapper: Max3satQaoaMapper, formula: CNF, program: FPQAProgram):
+    # shuttling "greedy" moves every aod atom to its trap as soon as the columns to its right
+    # let it, "chains" plans the fewest rounds for each color
+    def __init__(self, fpqa: FPQA, mapper: Max3satQaoaMapper, formula: CNF, program: FPQAProgram, shuttling: str = "greedy"):
+        if shuttling not in SHUTTLING_POLICIES:
+            raise ValueError(f"Unknown shuttling policy: {shuttling}")
         self.fpqa = fpqa
         self.mapper = mapper
         self.formula = formula
         self.program = program
+        self.shuttling = shuttling
     
     def shuttle_color(self, color: int):
         atom_map, rev_atom_map = self.mapper.get_atom_map()
@@ -22,10 +119,6 @@ class Max3satQaoaShuttler:
         clauses = self.mapper.color_groups[color]
         sorted_clauses = list(clauses)
         sorted_clauses.sort(key = lambda clause: self.fpqa.slm.traps[clause_map[clause][0][0]][clause_map[clause][0][1]].x)
-        participating_atoms = set()
-        for clause in sorted_clauses:
-            for literal in self.formula.clauses[clause]:
-                participating_atoms.add(atom_map[abs(literal) - 1].id)
         trap_map = {}
         max_slm_row = 0
         for clause in clauses:
@@ -34,6 +127,14 @@ class Max3satQaoaShuttler:
             for i in range(len(literals)):
                 trap_map[literals[i]] = traps[i]
                 max_slm_row = max(max_slm_row, traps[i][0])
+        # target trap and its x per atom id, nan for the atoms not taking part
+        num_ids = max(atom.id for atom in self.fpqa.atoms) + 1
+        target_x = np.full(num_ids, np.nan)
+        target_traps = {}
+        for literal, (slm_r, slm_c) in trap_map.items():
+            atom_id = atom_map[literal - 1].id
+            target_x[atom_id] = self.fpqa.slm.x[slm_r, slm_c]
+            target_traps[atom_id] = (slm_r, slm_c)
         last_clause = sorted(clause_map[sorted_clauses[-1]], key = lambda trap: trap[0])
         if last_clause[0][1] > last_clause[1][1]:
             tmp = last_clause[1]
@@ -42,45 +143,38 @@ class Max3satQaoaShuttler:
         last_trap = self.fpqa.slm.traps[last_clause[1][0]][last_clause[1][1]]
         prev_trap = self.fpqa.slm.traps[last_clause[0][0]][last_clause[0][1]]
         prev_y = self.fpqa.aod.rows[0]
-        shuttle_map = {}
-        num_shuttle = 0
-        for clause in clauses:
-            literals = list(map(abs, self.formula.clauses[clause]))
-            for literal in literals:
-                shuttle_map[literal] = False
-            num_shuttle += 3
+        num_shuttle = 3 * len(clauses)
+        columns = np.arange(len(self.fpqa.aod.cols))[::-1]
+        start_x = 2 * last_trap.x - prev_trap.x
+        spacing = self.fpqa.config.AOD_BEAM_PROXIMITY
+        rounds = None
+        if self.shuttling == "chains":
+            atom_ids = self.fpqa.aod.occupancy[0, columns]
+            candidates = np.where(atom_ids >= 0, target_x[np.maximum(atom_ids, 0)], np.nan)
+            rounds = iter(_minimum_rounds(start_x, candidates, spacing))
         while num_shuttle > 0:
-            last_x = 2 * last_trap.x - prev_trap.x
+            atom_ids = self.fpqa.aod.occupancy[0, columns]
+            candidates = np.where(atom_ids >= 0, target_x[np.maximum(atom_ids, 0)], np.nan)
+            if rounds is not None:
+                # only the columns of the round
+                planned = np.zeros(len(columns), dtype=bool)
+                planned[next(rounds)] = True
+                candidates = np.where(planned, candidates, np.nan)
+            targets, reached = _plan_columns(start_x, candidates, spacing)
+            if rounds is not None and not np.array_equal(reached, planned):
+                raise ValueError("Something wrong occurred in shuttler!")
             trap_switches_up = set()
             trap_switches_down = set()
-            instructions = []
-            for c in reversed(range(len(self.fpqa.aod.cols))):
-                atom = self.fpqa.aod.get_atom_at_trap(c, 0)
-                if atom is None or atom.id not in participating_atoms:
-                    last_x -= self.fpqa.config.AOD_BEAM_PROXIMITY # 2 * self.fpqa.config.AOD_BEAM_PROXIMITY
-                    instruction = Shuttle(self.fpqa, False, c, last_x - self.fpqa.aod.cols[c])
-                    instructions.append(instruction)
+            for c, atom_id in zip(columns[reached].tolist(), atom_ids[reached].tolist()):
+                slm_r, slm_c = target_traps[atom_id]
+                if slm_r != max_slm_row:
+                    trap_switches_up.add(((0, c), (slm_r, slm_c)))
                 else:
-                    literal = rev_atom_map[atom.id]
-                    trap = self.fpqa.slm.traps[trap_map[literal][0]][trap_map[literal][1]]
-                    instruction = Shuttle(self.fpqa, False, c, trap.x - self.fpqa.aod.cols[c])
-                    if trap.x > last_x:
-                        last_x -= self.fpqa.config.AOD_BEAM_PROXIMITY # 2 * self.fpqa.config.AOD_BEAM_PROXIMITY
-                        instruction = Shuttle(self.fpqa, False, c, last_x - self.fpqa.aod.cols[c])
-                        instructions.append(instruction)
-                        continue
-                    instructions.append(instruction)
-                    if trap_map[literal][0] != max_slm_row:
-                        trap_switches_up.add(((0, c), (trap_map[literal][0], trap_map[literal][1])))
-                    else:
-                        trap_switches_down.add(((0, c), (trap_map[literal][0], trap_map[literal][1])))
-                    num_shuttle -= 1
-                    last_x = trap.x
+                    trap_switches_down.add(((0, c), (slm_r, slm_c)))
+                num_shuttle -= 1
             if len(trap_switches_up) == 0 and len(trap_switches_down) == 0:
-                print(last_x, trap.x)
                 raise ValueError("Something wrong occurred in shuttler!")
-            parallel = Parallel(instructions)
-            self.program.add_instruction(parallel)
+            self.program.add_instruction(MultiShuttle(self.fpqa, False, columns, targets - self.fpqa.aod.cols[columns]))
             if len(trap_switches_up) > 0:
                 instruction = Shuttle(self.fpqa, True, 0, last_trap.y - self.fpqa.aod.rows[0])
                 self.program.add_instruction(instruction)
@@ -114,22 +208,16 @@ class Max3satQaoaShuttler:
         last_trap = self.fpqa.slm.traps[last_trap_r][last_trap_c]
         last_x = last_trap.x
         trap_switches = set()
-        instructions = []
-        for c in reversed(range(len(self.fpqa.aod.cols))):
-            atom = self.fpqa.aod.get_atom_at_trap(c, 0)
-            if atom is None:
+        targets = []
+        for c, atom_id in zip(columns.tolist(), self.fpqa.aod.occupancy[0, columns].tolist()):
+            if atom_id < 0:
                 last_x -= 2 * self.fpqa.config.AOD_BEAM_PROXIMITY
-                instruction = Shuttle(self.fpqa, False, c, last_x - self.fpqa.aod.cols[c])
-                instructions.append(instruction)
             else:
                 last_trap_c -= 2
-                last_trap = self.fpqa.slm.traps[last_trap_r][last_trap_c]
-                last_x = last_trap.x
-                instruction = Shuttle(self.fpqa, False, c, last_x - self.fpqa.aod.cols[c])
-                instructions.append(instruction)
+                last_x = float(self.fpqa.slm.x[last_trap_r, last_trap_c])
                 trap_switches.add(((0, c), (last_trap_r, last_trap_c)))
-        parallel = Parallel(instructions)
-        self.program.add_instruction(parallel)
+            targets.append(last_x)
+        self.program.add_instruction(MultiShuttle(self.fpqa, False, columns, np.array(targets) - self.fpqa.aod.cols[columns]))
         instructions = []
         for (aod_r, aod_c), (slm_r, slm_c) in trap_switches:
             transfer = TrapTransfer(self.fpqa, slm_r, slm_c, aod_r, aod_c)
@@ -138,15 +226,16 @@ class Max3satQaoaShuttler:
         self.program.add_instruction(parallel)
         atoms = [atom for atom in self.fpqa.atoms]
         atoms.sort(key = lambda atom: self.fpqa.slm.traps[atom.row][atom.col].x)
-        instructions = []
+        # every column goes back to the atom at its position in x order
+        num_cols = len(self.fpqa.aod.cols)
+        rows = np.array([atom.row for atom in atoms[:num_cols]], dtype=np.int64)
+        cols = np.array([atom.col for atom in atoms[:num_cols]], dtype=np.int64)
         trap_switches = set()
-        for c in range(len(self.fpqa.aod.cols)):
-            instruction = Shuttle(self.fpqa, False, c, self.fpqa.slm.traps[atoms[c].row][atoms[c].col].x - self.fpqa.aod.cols[c])
-            instructions.append(instruction)
-            if abs(self.fpqa.slm.traps[atoms[c].row][atoms[c].col].y - self.fpqa.aod.rows[0]) < 1e-09:
-                trap_switches.add(((0, c), (atoms[c].row, atoms[c].col)))
-        parallel = Parallel(instructions)
-        self.program.add_instruction(parallel)
+        is_level = np.abs(self.fpqa.slm.y[rows, cols] - self.fpqa.aod.rows[0]) < 1e-09
+        for c in np.flatnonzero(is_level).tolist():
+            trap_switches.add(((0, c), (int(rows[c]), int(cols[c]))))
+        columns = np.arange(num_cols)
+        self.program.add_instruction(MultiShuttle(self.fpqa, False, columns, self.fpqa.slm.x[rows, cols] - self.fpqa.aod.cols))
         instructions = []
         for (aod_r, aod_c), (slm_r, slm_c) in trap_switches:
             transfer = TrapTransfer(self.fpqa, slm_r, slm_c, aod_r, aod_c)
@@ -0,0 +1,194 @@
+from compiler.program import FPQAProgram
+from nac.instructions.base import Instruction
+from nac.instructions.raman import LocalRaman, GlobalRaman
+from nac.instructions.rydberg import Rydberg
+from nac.instructions.parallel import Parallel
+from nac.instructions.shuttle import Shuttle
+from nac.instructions.multi_shuttle import MultiShuttle
+from nac.instructions.trap_transfer import TrapTransfer
+from nac.instructions.aod_init import AODInit
+from nac.instructions.slm_init import SLMInit
+from nac.instructions.bind import Bind
+from nac.config import defaults
+from math import exp, log
+import numpy as np
+
+# the scalar libm routines FPQAProgram uses, numpy's vectorized ones may differ in the last bit
+_exp = np.vectorize(exp, otypes=[float])
+_log = np.vectorize(lambda value: log(value) if value > 0 else -np.inf, otypes=[float])
+_power = np.vectorize(pow, otypes=[float])
+# instructions times configs accumulated at once
+_MAX_ELEMENTS = 1 << 22
+
+class CostProfile:
+    # the config independent part of a compiled program: op counts per atom, shuttle distances
+    # and the shape of every instruction's duration and fidelity, from which the metrics of
+    # FPQAProgram are evaluated for whole grids of config values at once
+    def __init__(self, program: FPQAProgram):
+        self.config = program.fpqa.config
+        self.num_atoms = len(program.fpqa.atoms)
+        self.ops = program.count_ops()
+        self.atom_ids = [atom.id for atom in program.fpqa.atoms]
+        # u3, cz and ccz gates per atom
+        self.atom_ops = np.zeros((self.num_atoms, 3), dtype=np.int64)
+        self.shuttle_distances = []
+        self._atom_index = {atom_id: i for i, atom_id in enumerate(self.atom_ids)}
+        self._duration_terms, self._fidelity_terms = {}, {}
+        self._duration_steps, self._fidelity_steps = [], []
+        for instruction in program.instructions:
+            self._duration_steps.append(self._intern(self._duration_terms, self._duration_term(instruction)))
+            self._fidelity_steps.append(self._intern(self._fidelity_terms, self._fidelity_term(instruction)))
+            self._profile_atoms(instruction)
+        self.shuttle_distances = np.array(self.shuttle_distances, dtype=float)
+
+    def _intern(self, terms: dict, term: tuple) -> int:
+        return terms.setdefault(term, len(terms))
+
+    # terms mirror duration() and avg_fidelity() of the instructions, including their evaluation order
+    def _duration_term(self, instruction: Instruction) -> tuple:
+        if isinstance(instruction, Parallel):
+            # the maximum does not depend on the order, and of the shuttles only the longest
+            # offset matters since dividing by the (positive) speed is monotone
+            children = set()
+            for child in instruction.instructions:
+                term = self._duration_term(child)
+                children.update(term[1:] if term[0] == "max" else [term])
+            shuttles = [term for term in children if term[0] == "shuttle"]
+            if len(shuttles) > 0:
+                children = children.difference(shuttles)
+                children.add(max(shuttles))
+            return ("max",) + tuple(sorted(children))
+        if isinstance(instruction, Shuttle):
+            return ("shuttle", instruction.offset)
+        if isinstance(instruction, MultiShuttle):
+            # the term of the equivalent Parallel of shuttles
+            if len(instruction.offsets) == 0:
+                return ("max",)
+            return ("max", ("shuttle", float(np.max(instruction.offsets))))
+        if isinstance(instruction, (LocalRaman, GlobalRaman)):
+            return ("value", "U3_GATE_DURATION")
+        if isinstance(instruction, Rydberg):
+            if any(len(gate) == 3 for gate in instruction.gates):
+                return ("value", "CCZ_GATE_DURATION")
+            return ("value", "CZ_GATE_DURATION")
+        if isinstance(instruction, TrapTransfer):
+            return ("value", "TRAP_SWAP_DURATION")
+        if isinstance(instruction, (AODInit, SLMInit, Bind)):
+            return ("constant", 0.0)
+        raise ValueError(f"Unsupported instruction in cost profile: {type(instruction).__name__}")
+
+    def _fidelity_term(self, instruction: Instruction) -> tuple:
+        if isinstance(instruction, Parallel):
+            return ("product",) + tuple(self._fidelity_term(child) for child in instruction.instructions)
+        if isinstance(instruction, Shuttle):
+            return ("value", "SHUTTLING_FIDELITY")
+        if isinstance(instruction, MultiShuttle):
+            return ("product",) + (("value", "SHUTTLING_FIDELITY"),) * len(instruction.offsets)
+        if isinstance(instruction, LocalRaman):
+            return ("value", "U3_GATE_FIDELITY")
+        if isinstance(instruction, GlobalRaman):
+            return ("power", "U3_GATE_FIDELITY", self.num_atoms)
+        if isinstance(instruction, Rydberg):
+            gates = tuple(("value", "CCZ_GATE_FIDELITY" if len(gate) == 3 else "CZ_GATE_FIDELITY") for gate in instruction.gates)
+            return ("product",) + gates
+        if isinstance(instruction, TrapTransfer):
+            return ("value", "TRAP_SWAP_FIDELITY")
+        if isinstance(instruction, (AODInit, SLMInit, Bind)):
+            return ("constant", 1.0)
+        raise ValueError(f"Unsupported instruction in cost profile: {type(instruction).__name__}")
+
+    def _profile_atoms(self, instruction: Instruction):
+        if isinstance(instruction, Parallel):
+            for child in instruction.instructions:
+                self._profile_atoms(child)
+        elif isinstance(instruction, Shuttle):
+            self.shuttle_distances.append(abs(instruction.offset))
+        elif isinstance(instruction, MultiShuttle):
+            self.shuttle_distances.extend(np.abs(instruction.offsets).tolist())
+        elif isinstance(instruction, LocalRaman):
+            self.atom_ops[self._atom_index[instruction.atom.id], 0] += 1
+        elif isinstance(instruction, GlobalRaman):
+            self.atom_ops[:, 0] += 1
+        elif isinstance(instruction, Rydberg):
+            for gate in instruction.gates:
+                for atom_id in gate:
+                    self.atom_ops[self._atom_index[atom_id], len(gate) - 1] += 1
+
+    def _evaluate_term(self, term: tuple, config: dict[str, np.ndarray], shape: tuple) -> np.ndarray:
+        kind = term[0]
+        if kind == "constant":
+            return np.full(shape, term[1])
+        if kind == "value":
+            return config[term[1]]
+        if kind == "shuttle":
+            return term[1] / config["SHUTTLING_SPEED"]
+        if kind == "power":
+            return _power(config[term[1]], term[2])
+        if kind == "max":
+            value = np.zeros(shape)
+            for child in term[1:]:
+                value = np.maximum(value, self._evaluate_term(child, config, shape))
+            return value
+        value = np.ones(shape)
+        for child in term[1:]:
+            value = value * self._evaluate_term(child, config, shape)
+        return value
+
+    def _term_values(self, terms: dict, config: dict[str, np.ndarray], shape: tuple) -> list[np.ndarray]:
+        return [self._evaluate_term(term, config, shape) for term in terms]
+
+    def _sequential(self, values: list[np.ndarray], steps: list[int], shape: tuple, multiply: bool) -> np.ndarray:
+        # accumulated instruction by instruction in program order, to round exactly like FPQAProgram
+        table = np.stack([np.broadcast_to(value, shape).ravel() for value in values]) if len(values) > 0 else np.zeros((0, int(np.prod(shape))))
+        steps = np.asarray(steps, dtype=np.int64)
+        accumulate = np.multiply.accumulate if multiply else np.add.accumulate
+        result = np.full(table.shape[1], 1.0 if multiply else 0.0)
+        if len(steps) > 0:
+            chunk = max(1, _MAX_ELEMENTS // len(steps))
+            for start in range(0, table.shape[1], chunk):
+                result[start:start + chunk] = accumulate(table[steps, start:start + chunk], axis=0)[-1]
+        return result.reshape(shape)
+
+    def durations(self, config: dict[str, np.ndarray], shape: tuple) -> np.ndarray:
+        return self._sequential(self._term_values(self._duration_terms, config, shape), self._duration_steps, shape, False)
+
+    def configs(self, **values) -> tuple[dict[str, np.ndarray], tuple]:
+        # config values broadcast against each other, keys not given are taken from the program's config
+        for key in values:
+            if key not in defaults:
+                raise ValueError(f"Unknown config key: {key}")
+        values = {key: np.asarray(value, dtype=float) for key, value in values.items()}
+        shape = np.broadcast_shapes(*(value.shape for value in values.values()))
+        config = {key: np.broadcast_to(values.get(key, np.asarray(getattr(self.config, key), dtype=float)), shape) for key in defaults}
+        return config, shape
+
+    def busy_times(self, config: dict[str, np.ndarray]) -> np.ndarray:
+        return (self.ops["u3"] * config["U3_GATE_DURATION"] + self.ops["cz"] * 2 * config["CZ_GATE_DURATION"]
+                + self.ops["ccz"] * 3 * config["CCZ_GATE_DURATION"])
+
+    def idle_times(self, **values) -> np.ndarray:
+        # idle time of every atom, the last axis runs over the atoms in program order
+        config, shape = self.configs(**values)
+        duration = self.durations(config, shape)
+        busy = (self.atom_ops[:, 0] * config["U3_GATE_DURATION"][..., None] + self.atom_ops[:, 1] * config["CZ_GATE_DURATION"][..., None]
+                + self.atom_ops[:, 2] * config["CCZ_GATE_DURATION"][..., None])
+        return duration[..., None] - busy
+
+    def evaluate(self, **values) -> dict[str, np.ndarray]:
+        # e.g. evaluate(CCZ_GATE_FIDELITY=np.linspace(0.9775, 0.985, 4)[:, None], SHUTTLING_SPEED=[0.55, 1.1])
+        config, shape = self.configs(**values)
+        duration = self.durations(config, shape)
+        fidelities = self._term_values(self._fidelity_terms, config, shape)
+        gate_fidelity = self._sequential(fidelities, self._fidelity_steps, shape, True)
+        idle_time = self.num_atoms * duration - self.busy_times(config)
+        coherence_time = (config["QUBIT_DECAY"] * config["QUBIT_DEPHASING"]) / (config["QUBIT_DECAY"] + config["QUBIT_DEPHASING"])
+        coherence_fidelity = _exp(-idle_time / coherence_time)
+        log_fidelities = [_log(fidelity) for fidelity in fidelities]
+        log_avg_fidelity = -idle_time / coherence_time + self._sequential(log_fidelities, self._fidelity_steps, shape, False)
+        return {
+            "duration": duration,
+            "gate_fidelity": gate_fidelity,
+            "coherence_fidelity": coherence_fidelity,
+            "avg_fidelity": coherence_fidelity * gate_fidelity,
+            "log_avg_fidelity": log_avg_fidelity
+        }
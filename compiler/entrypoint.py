@@ -3,7 +3,9 @@ from compiler.program import FPQAProgram
 from compiler.color_mapper import Max3satQaoaMapper
 from compiler.color_shuttler import Max3satQaoaShuttler
 from compiler.color_executor import Max3satQaoaExecutor
-from utils.sat_utils import get_color_map
+from compiler.scheduler import schedule
+from compiler.cache import CompilationCache, cache_key, formula_key, config_key, canonical_value
+from utils.sat_utils import get_color_map, get_graph
 from nac.fpqa import FPQA
 from nac.config import FPQAConfig
 from nac.aod import AOD
@@ -11,22 +13,58 @@ from nac.slm.triangular_layout import TriangularLayout
 from nac.config import FPQAConfig
 from nac.atom import Atom
 from nac.instructions.raman import GlobalRaman
+from nac.parameter import Parameter
 import numpy as np
 
 
 class Max3satQaoaCompiler:
-    def __init__(self, formula: CNF, config: None | FPQAConfig = None):
+    def __init__(self, formula: CNF, config: None | FPQAConfig = None, verification: str = "full",
+                 coloring: str = "dsatur", coloring_time_budget: float = 0.0, scheduling: str | None = None,
+                 cache: CompilationCache | str | None = None, shuttling: str = "greedy", coloring_seed: int = 0):
         self.formula = formula
         self.config = config
+        self.verification = verification
+        self.coloring = coloring
+        self.coloring_time_budget = coloring_time_budget
+        self.coloring_seed = coloring_seed
+        self.scheduling = scheduling
+        self.shuttling = shuttling
+        # a cache directory or a shared CompilationCache
+        self.cache = CompilationCache(cache) if isinstance(cache, str) else cache
+        # colorings already computed by this compiler, per coloring options
+        self._colorings = {}
+
+    def _color_map(self, graph: tuple) -> tuple[int, list[int]]:
+        options = (self.coloring, float(self.coloring_time_budget), int(self.coloring_seed))
+        if options in self._colorings:
+            return self._colorings[options]
+        if self.cache is None:
+            coloring = get_color_map(self.formula, graph, self.coloring, self.coloring_time_budget, self.coloring_seed)
+        else:
+            key = cache_key("coloring", formula=formula_key(self.formula), coloring=self.coloring,
+                            coloring_time_budget=float(self.coloring_time_budget), coloring_seed=int(self.coloring_seed))
+            coloring = self.cache.get_coloring(key)
+            if coloring is None:
+                coloring = get_color_map(self.formula, graph, self.coloring, self.coloring_time_budget, self.coloring_seed)
+                self.cache.put_coloring(key, coloring)
+        self._colorings[options] = coloring
+        return coloring
+
+    def _program_key(self, p: int, gammas: list, betas: list, reverse_even_layers: bool) -> str:
+        return cache_key("program", formula=formula_key(self.formula), config=config_key(self.config),
+                         verification=self.verification, coloring=self.coloring,
+                         coloring_time_budget=float(self.coloring_time_budget), coloring_seed=int(self.coloring_seed),
+                         scheduling=self.scheduling, shuttling=self.shuttling, p=p,
+                         gammas=[canonical_value(gamma) for gamma in gammas], betas=[canonical_value(beta) for beta in betas],
+                         reverse_even_layers=reverse_even_layers)
 
     def _qaoa_equal_superposition(self, program: FPQAProgram):
         program.add_instruction(GlobalRaman(program.fpqa, np.pi / 2.0, 0.0, np.pi))
 
-    def _qaoa_mixer(self, program: FPQAProgram, parameter: float):
+    def _qaoa_mixer(self, program: FPQAProgram, parameter: float | Parameter):
         program.add_instruction(GlobalRaman(program.fpqa, parameter, 0.0, 0.0))
 
-    def compile_single_layer(self) -> FPQAProgram:
-        num_colors, color_map = get_color_map(self.formula)
+    def _initial_fpqa(self, num_colors: int) -> FPQA:
         num_slm_rows = (num_colors + 1) * 2
         num_slm_cols = len(self.formula.clauses) * 3 + self.formula.nv * 2
         num_aod_rows = 1
@@ -35,22 +73,67 @@ class Max3satQaoaCompiler:
         aod = AOD(config.INTERACTION_RADIUS / 2.0, num_aod_rows, num_aod_cols)
         slm = TriangularLayout(config.INTERACTION_RADIUS, num_slm_rows, num_slm_cols)
         atoms = [Atom(i + 1, False, 0, i) for i in range(self.formula.nv)]
-        fpqa = FPQA(slm, aod, atoms, config)
-        program = FPQAProgram(fpqa)
-        mapper = Max3satQaoaMapper(fpqa, self.formula)
-        shuttler = Max3satQaoaShuttler(fpqa, mapper, self.formula, program)
+        return FPQA(slm, aod, atoms, config)
+
+    def color_map(self) -> tuple[int, list[int]]:
+        # the coloring compile() uses, computed once per compiler and from the cache when there is one
+        return self._color_map(get_graph(self.formula, csr=True))
+
+    def initial_fpqa(self) -> FPQA:
+        # the fpqa compiled programs start from, e.g. to replay one with FPQAProgram.read
+        num_colors, _ = self.color_map()
+        return self._initial_fpqa(num_colors)
+
+    def compile(self, p: int = 1, gammas: list[float | Parameter] | None = None, betas: list[float | Parameter] | None = None,
+                reverse_even_layers: bool = True) -> FPQAProgram:
+        if p < 1:
+            raise ValueError(f"QAOA depth must be positive, got {p}.")
+        gammas = [0.2512 * np.pi] * p if gammas is None else list(gammas)
+        betas = [0.1235 * np.pi] * p if betas is None else list(betas)
+        if len(gammas) != p or len(betas) != p:
+            raise ValueError(f"Expected {p} cost and mixer parameters.")
+        parameters = [parameter for parameter in gammas + betas if isinstance(parameter, Parameter)]
+        if self.cache is not None:
+            key = self._program_key(p, gammas, betas, reverse_even_layers)
+            program = self.cache.get_program(key, self.config, parameters)
+            if program is not None:
+                return program
+        graph = get_graph(self.formula, csr=True)
+        num_colors, color_map = self._color_map(graph)
+        fpqa = self._initial_fpqa(num_colors)
+        program = FPQAProgram(fpqa, self.verification)
+        for parameter in parameters:
+            program.add_parameter(parameter)
+        mapper = Max3satQaoaMapper(fpqa, self.formula, graph, (num_colors, color_map))
+        shuttler = Max3satQaoaShuttler(fpqa, mapper, self.formula, program, self.shuttling)
         executor = Max3satQaoaExecutor(fpqa, mapper, self.formula, program)
         self._qaoa_equal_superposition(program)
-        # TO-DO: Randomize parameter
-        parameter = 0.2512 * np.pi
-        for color in range(num_colors):
-            shuttler.shuttle_color(color)
-            executor.execute_color(color, parameter)
-        executor.implement_linear_terms(parameter)
-        # TO-DO: Randomize parameter
-        parameter = 0.1235 * np.pi
-        self._qaoa_mixer(program, parameter)
+        for layer in range(p):
+            executor.reset_layer()
+            colors = list(range(num_colors))
+            # the cost terms commute, even layers walk the colors backwards
+            # and start with the color the previous layer ended with
+            if reverse_even_layers and layer % 2 == 1:
+                colors.reverse()
+            for color in colors:
+                shuttler.shuttle_color(color)
+                executor.execute_color(color, gammas[layer])
+            executor.implement_linear_terms(gammas[layer])
+            self._qaoa_mixer(program, betas[layer])
         for atom_pair in executor.quadratic_terms:
             if abs(executor.quadratic_terms[atom_pair]) > 1:
                 print(atom_pair, executor.quadratic_terms[atom_pair])
-        return program
\ No newline at end of file
+        if self.scheduling is not None:
+            program = schedule(program, self.scheduling)
+        if self.cache is not None:
+            self.cache.put_program(key, program)
+        return program
+
+    def compile_single_layer(self, gamma: float | Parameter = 0.2512 * np.pi, beta: float | Parameter = 0.1235 * np.pi) -> FPQAProgram:
+        return self.compile(1, [gamma], [beta])
+
+    def compile_parametric(self, p: int = 1) -> FPQAProgram:
+        # program.bind(*gammas, *betas) sets the angles of the compiled schedule
+        if p == 1:
+            return self.compile(1, [Parameter("gamma")], [Parameter("beta")])
+        return self.compile(p, [Parameter(f"gamma_{i}") for i in range(p)], [Parameter(f"beta_{i}") for i in range(p)])
@@ -0,0 +1,80 @@
+from typing import Callable
+from compiler.program import FPQAProgram
+from utils.hamiltonians import Max3satHamiltonian
+from utils.qaoa_evaluator import Max3satQaoaEvaluator
+from pysat.formula import CNF
+import numpy as np
+
+OPTIMIZATION_METHODS = ("grid", "spsa", "cobyla")
+
+def expected_unsatisfied_objective(formula: CNF) -> Callable[[FPQAProgram], float]:
+    # ideal estimate for programs bound as (*gammas, *betas), the global Raman mixer
+    # u3(beta, 0, 0) is exp(-i beta / 2 Y)
+    evaluator = Max3satQaoaEvaluator(Max3satHamiltonian(formula=formula), mixer="y")
+
+    def objective(program: FPQAProgram) -> float:
+        values = [float(parameter) for parameter in program.parameters]
+        p = len(values) // 2
+        gammas, betas = values[:p], [beta / 2.0 for beta in values[p:]]
+        return evaluator.expected_unsatisfied(gammas, betas, method="lightcone" if p == 1 else "statevector")
+
+    return objective
+
+class ParameterOptimizer:
+    def __init__(self, program: FPQAProgram, objective: Callable[[FPQAProgram], float]):
+        if len(program.parameters) == 0:
+            raise ValueError("Program has no parameters to optimize.")
+        self.program = program
+        self.objective = objective
+        self.history = []
+
+    def evaluate(self, values: list[float]) -> float:
+        self.program.bind(*values)
+        value = self.objective(self.program)
+        self.history.append((list(values), value))
+        return value
+
+    def _best(self) -> tuple[list[float], float]:
+        values, value = min(self.history, key=lambda entry: entry[1])
+        self.program.bind(*values)
+        return values, value
+
+    def grid(self, bounds: list[tuple[float, float]], resolution: int = 16) -> tuple[list[float], float]:
+        if len(bounds) != len(self.program.parameters):
+            raise ValueError("Bounds do not match the program parameters.")
+        axes = [np.linspace(low, high, resolution, endpoint=False) for low, high in bounds]
+        for values in np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(bounds)):
+            self.evaluate(values.tolist())
+        return self._best()
+
+    def spsa(self, initial: list[float], iterations: int = 100, a: float = 0.2, c: float = 0.1,
+             alpha: float = 0.602, gamma: float = 0.101, seed: int | None = None) -> tuple[list[float], float]:
+        # simultaneous perturbation stochastic approximation with Spall's gain sequences
+        rng = np.random.default_rng(seed)
+        values = np.array(initial, dtype=float)
+        for k in range(iterations):
+            a_k = a / (k + 1 + 0.1 * iterations) ** alpha
+            c_k = c / (k + 1) ** gamma
+            delta = rng.choice((-1.0, 1.0), size=values.size)
+            gradient = (self.evaluate((values + c_k * delta).tolist()) - self.evaluate((values - c_k * delta).tolist())) / (2.0 * c_k) * delta
+            values = values - a_k * gradient
+        self.evaluate(values.tolist())
+        return self._best()
+
+    def cobyla(self, initial: list[float], iterations: int = 100, rhobeg: float = 0.1) -> tuple[list[float], float]:
+        try:
+            from scipy.optimize import minimize
+        except ImportError:
+            raise ImportError("COBYLA optimization requires scipy.")
+        minimize(lambda values: self.evaluate(values.tolist()), np.array(initial, dtype=float), method="COBYLA",
+                 options={"maxiter": iterations, "rhobeg": rhobeg})
+        return self._best()
+
+    def optimize(self, method: str = "grid", **options) -> tuple[list[float], float]:
+        if method == "grid":
+            return self.grid(**options)
+        if method == "spsa":
+            return self.spsa(**options)
+        if method == "cobyla":
+            return self.cobyla(**options)
+        raise ValueError(f"Unknown optimization method: {method}")
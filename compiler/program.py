@@ -1,17 +1,29 @@
 from nac.instructions.base import Instruction
-from nac.instructions.raman import LocalRaman, GlobalRaman
 from nac.instructions.rydberg import Rydberg
-from nac.instructions.parallel import Parallel
 from nac.instructions.aod_init import AODInit
 from nac.instructions.slm_init import SLMInit
 from nac.instructions.bind import Bind
 from nac.fpqa import FPQA
-from math import exp
+from nac.config import defaults
+from nac.parameter import Parameter
+from compiler.timeline import Timeline
+from compiler.serialization import encode_instructions, decode_instructions, layout_header, program_header, build_fpqa, write_binary, read_binary
+from compiler.wqasm import WqasmParser, rydberg_pulses
+from math import exp, log, inf
+from typing import Iterable, Iterator, TextIO
+import gzip
 
 class FPQAProgram:
-    def __init__(self, fpqa: FPQA):
+    def __init__(self, fpqa: FPQA, verification: str = "full"):
         self.fpqa = fpqa
+        self.fpqa.set_verification(verification)
         self.instructions = []
+        self.parameters = []
+        self._ops = {"u3": 0, "cz": 0, "ccz": 0}
+        self._timeline = Timeline(fpqa)
+        # the fpqa only keeps its current state, the instructions start from this one
+        self.initial_layout = layout_header(fpqa)
+        self._reset_config_aggregates()
 
     def _slm_init(self):
         self.instructions.append(SLMInit(self.fpqa))
@@ -24,6 +36,10 @@ class FPQAProgram:
             atom = self.fpqa.atoms[i]
             self.instructions.append(Bind(self.fpqa, f"q[{i}]", atom, atom.is_slm, atom.row, atom.col))
 
+    def _parameters_init(self) -> str:
+        lines = [f"input float[64] {parameter.name};" for parameter in self.parameters if not parameter.is_bound()]
+        return "\n".join(lines + [""])
+
     def _qubits_init(self) -> str:
         num_qubits = len(self.fpqa.atoms)
         return f"qubit[{num_qubits}] q;\nreset q;\n"
@@ -43,101 +59,167 @@ class FPQAProgram:
         lines = [f"bit[{num_qubits}] b;", "b = measure q;"]
         return "\n".join(lines)
 
-    def add_instruction(self, instruction: Instruction):
-        instruction.apply()
+    def _config_key(self) -> tuple:
+        return tuple(getattr(self.fpqa.config, key) for key in defaults)
+
+    def _reset_config_aggregates(self):
+        self._duration = 0
+        self._fidelity = 1.0
+        self._log_fidelity = 0.0
+        self._aggregated_config = self._config_key()
+
+    def _accumulate(self, instruction: Instruction):
+        self._duration += instruction.duration()
+        fidelity = instruction.avg_fidelity()
+        self._fidelity *= fidelity
+        self._log_fidelity += log(fidelity) if fidelity > 0 else -inf
+
+    def _refresh(self):
+        # durations and fidelities depend on the config, which may be changed after compilation
+        if self._config_key() != self._aggregated_config:
+            self._reset_config_aggregates()
+            for instruction in self.instructions:
+                self._accumulate(instruction)
+            self._timeline.refresh()
+
+    def add_instruction(self, instruction: Instruction, apply: bool = True):
+        # apply=False records an instruction that has already been applied to the fpqa
+        if apply:
+            instruction.apply()
         self.instructions.append(instruction)
+        self._refresh()
+        self._accumulate(instruction)
+        self._timeline.add(instruction)
+        for op, count in instruction.count_ops().items():
+            self._ops[op] += count
 
-    def avg_fidelity(self):
-        fidelity = 1.0
-        for instruction in self.instructions:
-            fidelity *= instruction.avg_fidelity()
-        return self.coherence_fidelity() * fidelity
+    def add_parameter(self, parameter: Parameter):
+        self.parameters.append(parameter)
+
+    def bind(self, *values: float | None) -> "FPQAProgram":
+        # angles refer to the parameters, binding never touches the schedule
+        if len(values) != len(self.parameters):
+            raise ValueError(f"Expected {len(self.parameters)} parameter values, got {len(values)}.")
+        for parameter, value in zip(self.parameters, values):
+            parameter.bind(value)
+        return self
+
+    def avg_fidelity(self, exact: bool = False):
+        self._refresh()
+        return self.coherence_fidelity(exact) * self._fidelity
+
+    def log_avg_fidelity(self, exact: bool = False) -> float:
+        # log of avg_fidelity, without underflow for long programs
+        self._refresh()
+        idle_time = sum(self._timeline.idle_times().values()) if exact else self._idle_time()
+        return -idle_time / self._efficient_coherence_time() + self._log_fidelity
+
+    def timeline(self) -> Timeline:
+        self._refresh()
+        return self._timeline
 
     def duration(self):
-        duration = 0
-        for instruction in self.instructions:
-            duration += instruction.duration()
-        return duration
-
-    def coherence_fidelity(self):
-        total_time = len(self.fpqa.atoms) * self.duration()
-        busy_time = 0
-        for instruction in self.instructions:
-            if isinstance(instruction, LocalRaman):
-                busy_time += self.fpqa.config.U3_GATE_DURATION
-            if isinstance(instruction, GlobalRaman):
-                busy_time += len(self.fpqa.atoms) * self.fpqa.config.U3_GATE_DURATION
-            if isinstance(instruction, Rydberg):
-                for gate in instruction.gates:
-                    if len(gate) == 2:
-                        busy_time += 2 * self.fpqa.config.CZ_GATE_DURATION
-                    if len(gate) == 3:
-                        busy_time += 3 * self.fpqa.config.CCZ_GATE_DURATION
-            if isinstance(instruction, Parallel):
-                for sub_instruction in instruction.instructions:
-                    if isinstance(sub_instruction, LocalRaman):
-                        busy_time += self.fpqa.config.U3_GATE_DURATION
-                    if isinstance(sub_instruction, GlobalRaman):
-                        busy_time += len(self.fpqa.atoms) * self.fpqa.config.U3_GATE_DURATION
-                    if isinstance(sub_instruction, Rydberg):
-                        for gate in sub_instruction.gates:
-                            if len(gate) == 2:
-                                busy_time += 2 * self.fpqa.config.CZ_GATE_DURATION
-                            if len(gate) == 3:
-                                busy_time += 3 * self.fpqa.config.CCZ_GATE_DURATION 
-        idle_time = total_time - busy_time
-        efficient_coherence_time = (self.fpqa.config.QUBIT_DECAY * self.fpqa.config.QUBIT_DEPHASING) / (self.fpqa.config.QUBIT_DECAY + self.fpqa.config.QUBIT_DEPHASING)
-        return exp(-idle_time / efficient_coherence_time)
+        self._refresh()
+        return self._duration
+
+    def busy_time(self) -> float:
+        config = self.fpqa.config
+        return (self._ops["u3"] * config.U3_GATE_DURATION + self._ops["cz"] * 2 * config.CZ_GATE_DURATION
+                + self._ops["ccz"] * 3 * config.CCZ_GATE_DURATION)
+
+    def _idle_time(self) -> float:
+        return len(self.fpqa.atoms) * self.duration() - self.busy_time()
+
+    def _efficient_coherence_time(self) -> float:
+        config = self.fpqa.config
+        return (config.QUBIT_DECAY * config.QUBIT_DEPHASING) / (config.QUBIT_DECAY + config.QUBIT_DEPHASING)
+
+    def coherence_fidelity(self, exact: bool = False):
+        # exact takes the idle time of every atom from the timeline instead of
+        # num_atoms * duration - busy_time
+        if exact:
+            return self.timeline().coherence_fidelity()
+        return exp(-self._idle_time() / self._efficient_coherence_time())
 
     def count_ops(self):
-        ops = {
-            "u3": 0,
-            "cz": 0,
-            "ccz": 0
-        }
-        for instruction in self.instructions:
-            if isinstance(instruction, LocalRaman):
-                ops["u3"] += 1
-            if isinstance(instruction, GlobalRaman):
-                ops["u3"] += len(self.fpqa.atoms)
-            if isinstance(instruction, Rydberg):
-                for gate in instruction.gates:
-                    if len(gate) == 2:
-                        ops["cz"] += 1
-                    if len(gate) == 3:
-                        ops["ccz"] += 1
-            if isinstance(instruction, Parallel):
-                for sub_instruction in instruction.instructions:
-                    if isinstance(sub_instruction, LocalRaman):
-                        ops["u3"] += 1
-                    if isinstance(sub_instruction, GlobalRaman):
-                        ops["u3"] += len(self.fpqa.atoms)
-                    if isinstance(sub_instruction, Rydberg):
-                        for gate in sub_instruction.gates:
-                            if len(gate) == 2:
-                                ops["cz"] += 1
-                            if len(gate) == 3:
-                                ops["ccz"] += 1
-        return ops
+        return dict(self._ops)
 
-    def to_string(self):
-        num_qubits = len(self.fpqa.atoms)
-        lines = [self._wqasm_init()]
+    def iter_qasm(self) -> Iterator[str]:
+        # the program text chunk by chunk, every chunk ends with a newline
+        yield self._wqasm_init() + "\n"
+        if any(not parameter.is_bound() for parameter in self.parameters):
+            yield self._parameters_init() + "\n"
         init_instructions = filter(lambda instr: type(instr) in {SLMInit, AODInit, Bind}, self.instructions)
         exec_instructions = filter(lambda instr: type(instr) not in {SLMInit, AODInit, Bind}, self.instructions)
         for instr in init_instructions:
-            lines.append(instr.qasm())
-        lines.append(self._qubits_init())
+            yield instr.qasm() + "\n"
+        yield self._qubits_init() + "\n"
         for instr in exec_instructions:
-            lines.append(instr.qasm())
-        lines.append(self.add_measurement())
-        lines.append("")
-        return "\n".join(lines)
+            yield instr.qasm() + "\n"
+        yield self.add_measurement() + "\n"
+
+    def to_string(self):
+        return "".join(self.iter_qasm())
+
+    def write(self, target: str | TextIO, compress: bool | None = None):
+        # target is a filename or an open text stream, files are gzip compressed
+        # when compress is set or, by default, when the filename ends with .gz
+        if isinstance(target, str):
+            if compress is None:
+                compress = target.endswith(".gz")
+            with gzip.open(target, "wt") if compress else open(target, "w") as stream:
+                self.write(stream)
+            return
+        if compress:
+            raise ValueError("Compression is only supported when writing to a file.")
+        target.writelines(self.iter_qasm())
+
+    def save(self, filename: str):
+        header = program_header(self.fpqa, self.initial_layout, self.parameters)
+        write_binary(filename, header, *encode_instructions(header, self.instructions, self.parameters))
 
-    def write(self, filename):
-        f = open(filename, "w")
-        f.write(self.to_string())
-        f.close()
+    @staticmethod
+    def load(filename: str, replay: bool = False, parameters: list[Parameter] | None = None) -> "FPQAProgram":
+        # by default the fpqa is rebuilt in its final state and the instructions get the state
+        # they were saved with, replay applies and verifies them again from the initial state
+        # the angles refer to the given parameters instead of new ones bound to the saved values
+        header, records, values, indices = read_binary(filename)
+        fpqa = build_fpqa(header, "initial_layout" if replay else "final_layout")
+        program = FPQAProgram(fpqa, header["verification"])
+        program.initial_layout = header["initial_layout"]
+        if parameters is not None:
+            if [parameter.name for parameter in parameters] != [name for name, _ in header["parameters"]]:
+                raise ValueError(f"Parameters do not match the saved program: {[name for name, _ in header['parameters']]}")
+            for parameter in parameters:
+                program.add_parameter(parameter)
+        else:
+            for name, value in header["parameters"]:
+                parameter = Parameter(name)
+                parameter.bind(value)
+                program.add_parameter(parameter)
+        for instruction in decode_instructions(header, records, values, indices, fpqa, program.parameters, not replay):
+            program.add_instruction(instruction, replay)
+        return program
 
-    def load(self):
-        pass
\ No newline at end of file
+    @staticmethod
+    def read(source: str | Iterable[str], fpqa: FPQA, verification: str = "full") -> "FPQAProgram":
+        # replays a wQASM file (gzip compressed when the name ends with .gz) or any iterable
+        # of its lines on an fpqa in the initial state of the program, every instruction is
+        # applied and verified and every rydberg pulse has to entangle the gates written
+        if isinstance(source, str):
+            with gzip.open(source, "rt") if source.endswith(".gz") else open(source) as stream:
+                return FPQAProgram.read(stream, fpqa, verification)
+        program = FPQAProgram(fpqa, verification)
+        parser = WqasmParser(fpqa)
+        for instruction in parser.parse(source):
+            pulses = [(pulse, pulse.gates, pulse.atoms) for pulse in rydberg_pulses(instruction)]
+            instruction.apply()
+            for pulse, gates, atoms in pulses:
+                if {frozenset(gate) for gate in pulse.gates} != {frozenset(gate) for gate in gates}:
+                    raise ValueError(f"Rydberg pulse {pulse.gate_name} does not entangle the gates of the program.")
+                # the order of the file, which the fidelity product follows
+                pulse.gates, pulse.atoms = gates, atoms
+            program.add_instruction(instruction, apply=False)
+        for parameter in parser.parameters:
+            program.add_parameter(parameter)
+        return program
@@ -0,0 +1,75 @@
+from compiler.program import FPQAProgram
+from nac.instructions.base import Instruction
+from nac.instructions.parallel import Parallel
+from nac.instructions.raman import LocalRaman
+from nac.instructions.shuttle import Shuttle
+from nac.instructions.multi_shuttle import MultiShuttle
+from nac.instructions.trap_transfer import TrapTransfer
+
+SCHEDULING_POLICIES = ("asap", "alap")
+
+def _resources(instruction: Instruction) -> set | None:
+    # atoms an instruction acts on, plus the aod for everything that moves atoms since the
+    # positions at the next Rydberg pulse depend on the order of the moves, None marks
+    # instructions that nothing may cross (Rydberg and global pulses, initialization)
+    if type(instruction) is Parallel:
+        resources = set()
+        for child in instruction.instructions:
+            child_resources = _resources(child)
+            if child_resources is None:
+                return None
+            resources.update(child_resources)
+        return resources
+    if type(instruction) is LocalRaman:
+        return {instruction.atom.id}
+    if type(instruction) in (Shuttle, MultiShuttle, TrapTransfer):
+        return instruction.touched_atoms() | {"aod"}
+    return None
+
+def _layers(instructions: list[Instruction]) -> list[list[Instruction]]:
+    # every instruction goes to the first layer after the last one sharing a resource with it
+    layers, ready, barrier = [], {}, 0
+    for instruction in instructions:
+        resources = _resources(instruction)
+        if resources is None:
+            layer = len(layers)
+            barrier = layer + 1
+        else:
+            layer = max([barrier] + [ready.get(resource, 0) for resource in resources])
+            for resource in resources:
+                ready[resource] = layer + 1
+        if layer == len(layers):
+            layers.append([])
+        layers[layer].append(instruction)
+    return layers
+
+def _merge(layer: list[Instruction]) -> Instruction:
+    if len(layer) == 1:
+        return layer[0]
+    instructions = []
+    for instruction in layer:
+        # a multi line shuttle joins the layer as its single line shuttles, as a Parallel would
+        if type(instruction) is Parallel:
+            instructions.extend(instruction.instructions)
+        elif type(instruction) is MultiShuttle:
+            instructions.extend(instruction.shuttles())
+        else:
+            instructions.append(instruction)
+    return Parallel(instructions)
+
+def schedule(program: FPQAProgram, policy: str = "asap") -> FPQAProgram:
+    # packs the instructions of a compiled program into Parallel layers, as soon (asap) or
+    # as late (alap) as the instructions they share atoms or the aod with allow
+    if policy not in SCHEDULING_POLICIES:
+        raise ValueError(f"Unknown scheduling policy: {policy}")
+    if policy == "asap":
+        layers = _layers(program.instructions)
+    else:
+        layers = [list(reversed(layer)) for layer in reversed(_layers(list(reversed(program.instructions))))]
+    scheduled = FPQAProgram(program.fpqa, program.fpqa.verification)
+    scheduled.initial_layout = program.initial_layout
+    for parameter in program.parameters:
+        scheduled.add_parameter(parameter)
+    for layer in layers:
+        scheduled.add_instruction(_merge(layer), apply=False)
+    return scheduled
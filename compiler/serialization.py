@@ -0,0 +1,279 @@
+from nac.instructions.base import Instruction
+from nac.instructions.raman import LocalRaman, GlobalRaman
+from nac.instructions.rydberg import Rydberg
+from nac.instructions.parallel import Parallel
+from nac.instructions.shuttle import Shuttle
+from nac.instructions.multi_shuttle import MultiShuttle
+from nac.instructions.trap_transfer import TrapTransfer
+from nac.slm.triangular_layout import TriangularLayout
+from nac.slm.square_layout import SquareGrid
+from nac.aod import AOD
+from nac.atom import Atom
+from nac.fpqa import FPQA
+from nac.config import FPQAConfig, defaults
+from nac.parameter import Parameter, ParameterExpression
+from typing import Iterator
+import json
+import numpy as np
+
+MAGIC = b"FPQAPRG\x00"
+FORMAT_VERSION = 1
+SLM_LAYOUTS = {"TriangularLayout": TriangularLayout, "SquareGrid": SquareGrid}
+
+LOCAL_RAMAN = 1
+GLOBAL_RAMAN = 2
+RYDBERG = 3
+SHUTTLE = 4
+TRAP_TRANSFER = 5
+PARALLEL = 6
+MULTI_SHUTTLE = 7
+
+# one record per instruction, with the values (angles, shuttle offsets) in a table of distinct
+# constants and scaled parameters, and the indices an instruction needs beyond its record
+# (line indices and values of a multi shuttle, Rydberg gates as size followed by ids) in a
+# side table consumed in record order:
+#   LOCAL_RAMAN    atom id, value per angle                  |
+#   GLOBAL_RAMAN   0, value per angle                        |
+#   RYDBERG        gate name suffix, number of gates, atoms  | gates, atoms
+#   SHUTTLE        line index, value                         |
+#   TRAP_TRANSFER  slm row, slm col, aod row, aod col        |
+#   PARALLEL       number of instructions in the block, which follow it
+#   MULTI_SHUTTLE  number of lines                           | line indices, value per line
+# flag bit i of a raman record marks angle i as a parameter scaled by its value, the flags
+# of a shuttle or multi shuttle tell whether it moves rows
+# the moved and transferred atoms are not stored, they follow from the initial layout since
+# only transfers change which atoms the aod lines hold
+# the tables are not compressed so that they can be memory mapped, gzipped wQASM is smaller
+RECORD_DTYPE = np.dtype([("opcode", "u1"), ("flags", "u1"), ("operands", "<i4", (4,))])
+VALUE_DTYPE = np.dtype([("parameter", "<i4"), ("value", "<f8")])
+INDEX_DTYPE = np.dtype("<i4")
+_ALIGNMENT = 8
+
+class _Occupancy:
+    # atom ids per slm and aod trap, tracked through the transfers of a program
+    def __init__(self, header: dict):
+        layout = header["initial_layout"]
+        self.slm = np.full((header["slm"]["rows"], header["slm"]["cols"]), -1, dtype=np.int32)
+        self.aod = np.full((len(layout["aod_rows"]), len(layout["aod_cols"])), -1, dtype=np.int32)
+        for atom_id, is_slm, row, col in layout["atoms"]:
+            (self.slm if is_slm else self.aod)[row, col] = atom_id
+
+    def line(self, is_row: bool, index: int) -> list[int]:
+        line = self.aod[index] if is_row else self.aod[:, index]
+        return line[line >= 0].tolist()
+
+    def transfer(self, slm_row: int, slm_col: int, aod_row: int, aod_col: int) -> list[int]:
+        slm_atom, aod_atom = int(self.slm[slm_row, slm_col]), int(self.aod[aod_row, aod_col])
+        self.slm[slm_row, slm_col], self.aod[aod_row, aod_col] = aod_atom, slm_atom
+        return [atom_id for atom_id in (slm_atom, aod_atom) if atom_id >= 0]
+
+class _Encoder:
+    def __init__(self, header: dict, parameters: list[Parameter]):
+        self.parameter_index = {id(parameter): i for i, parameter in enumerate(parameters)}
+        self.occupancy = _Occupancy(header)
+        self.value_index = {}
+        self.records, self.values, self.indices = [], [], []
+
+    def _value(self, parameter: int, value: float) -> int:
+        # the hex form keeps -0.0 apart from 0.0
+        key = (parameter, float(value).hex())
+        if key not in self.value_index:
+            self.value_index[key] = len(self.values)
+            self.values.append((parameter, value))
+        return self.value_index[key]
+
+    def _angles(self, angles: tuple) -> tuple[int, list[int]]:
+        flags, indices = 0, []
+        for i, angle in enumerate(angles):
+            if isinstance(angle, (Parameter, ParameterExpression)):
+                parameter = angle if isinstance(angle, Parameter) else angle.parameter
+                if id(parameter) not in self.parameter_index:
+                    raise ValueError(f"Parameter {parameter.name} is not registered with the program.")
+                if isinstance(angle, ParameterExpression):
+                    flags |= 1 << i
+                    indices.append(self._value(self.parameter_index[id(parameter)], angle.scale))
+                else:
+                    indices.append(self._value(self.parameter_index[id(parameter)], 1.0))
+            else:
+                indices.append(self._value(-1, angle))
+        return flags, indices
+
+    def _check(self, stored: list, derived: list[int]):
+        if [atom.id for atom in stored] != derived:
+            raise ValueError("Moved or transferred atoms do not follow from the initial layout of the program.")
+
+    def encode(self, instruction: Instruction):
+        if isinstance(instruction, Parallel):
+            self.records.append((PARALLEL, 0, (len(instruction.instructions), 0, 0, 0)))
+            for child in instruction.instructions:
+                self.encode(child)
+        elif isinstance(instruction, LocalRaman):
+            flags, indices = self._angles((instruction.x_angle, instruction.y_angle, instruction.z_angle))
+            self.records.append((LOCAL_RAMAN, flags, (instruction.atom.id, *indices)))
+        elif isinstance(instruction, GlobalRaman):
+            flags, indices = self._angles((instruction.x_angle, instruction.y_angle, instruction.z_angle))
+            self.records.append((GLOBAL_RAMAN, flags, (0, *indices)))
+        elif isinstance(instruction, Rydberg):
+            # the gate name is kept so that re-emitted QASM matches the original
+            # gates and atoms are kept in iteration order, which the QASM and the fidelity product follow
+            operands = (int(instruction.gate_name.rsplit("_", 1)[1]), len(instruction.gates), len(instruction.atoms), 0)
+            self.records.append((RYDBERG, 0, operands))
+            for gate in instruction.gates:
+                self.indices.append(len(gate))
+                self.indices.extend(gate)
+            self.indices.extend(instruction.atoms)
+        elif isinstance(instruction, Shuttle):
+            self._check(instruction.moved_atoms, self.occupancy.line(instruction.is_row, instruction.index))
+            self.records.append((SHUTTLE, int(instruction.is_row), (instruction.index, self._value(-1, instruction.offset), 0, 0)))
+        elif isinstance(instruction, MultiShuttle):
+            for index, atoms in zip(instruction.indices.tolist(), instruction.moved_atoms):
+                self._check(atoms, self.occupancy.line(instruction.is_row, index))
+            self.records.append((MULTI_SHUTTLE, int(instruction.is_row), (len(instruction.indices), 0, 0, 0)))
+            self.indices.extend(instruction.indices.tolist())
+            self.indices.extend(self._value(-1, offset) for offset in instruction.offsets.tolist())
+        elif isinstance(instruction, TrapTransfer):
+            operands = (instruction.slm_row, instruction.slm_col, instruction.aod_row, instruction.aod_col)
+            self._check(instruction.transferred_atoms, self.occupancy.transfer(*operands))
+            self.records.append((TRAP_TRANSFER, 0, operands))
+        else:
+            raise ValueError(f"Unsupported instruction in binary format: {type(instruction).__name__}")
+
+def encode_instructions(header: dict, instructions: list[Instruction], parameters: list[Parameter]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    encoder = _Encoder(header, parameters)
+    for instruction in instructions:
+        encoder.encode(instruction)
+    return (np.array(encoder.records, dtype=RECORD_DTYPE), np.array(encoder.values, dtype=VALUE_DTYPE),
+            np.array(encoder.indices, dtype=INDEX_DTYPE))
+
+def _decode_angles(flags: int, operands: list[int], value_parameters: list[int], values: list[float], parameters: list[Parameter]) -> list:
+    angles = []
+    for i, operand in enumerate(operands):
+        if value_parameters[operand] < 0:
+            angles.append(values[operand])
+        elif flags & (1 << i):
+            angles.append(ParameterExpression(parameters[value_parameters[operand]], values[operand]))
+        else:
+            angles.append(parameters[value_parameters[operand]])
+    return angles
+
+def decode_instructions(header: dict, records: np.ndarray, values: np.ndarray, indices: np.ndarray, fpqa: FPQA,
+                        parameters: list[Parameter], restore: bool = True) -> Iterator[Instruction]:
+    # yields the top level instructions, restore sets the state apply() would leave in them
+    # (gates, moved and transferred atoms), otherwise they are left to be applied
+    value_parameters, values, indices = values["parameter"].tolist(), values["value"].tolist(), indices.tolist()
+    atom_by_id = {atom.id: atom for atom in fpqa.atoms}
+    occupancy = _Occupancy(header) if restore else None
+    index, blocks = 0, []
+    for opcode, flags, operands in zip(records["opcode"].tolist(), records["flags"].tolist(), records["operands"].tolist()):
+        if opcode == PARALLEL:
+            if operands[0] > 0:
+                blocks.append((operands[0], []))
+                continue
+            instruction = Parallel([])
+        elif opcode == LOCAL_RAMAN:
+            instruction = LocalRaman(fpqa, atom_by_id[operands[0]], *_decode_angles(flags, operands[1:], value_parameters, values, parameters))
+        elif opcode == GLOBAL_RAMAN:
+            instruction = GlobalRaman(fpqa, *_decode_angles(flags, operands[1:], value_parameters, values, parameters))
+        elif opcode == RYDBERG:
+            instruction = Rydberg(fpqa)
+            instruction.gate_name = f"global_rydberg_{operands[0]}"
+            gates = []
+            for _ in range(operands[1]):
+                gates.append(tuple(indices[index + 1:index + 1 + indices[index]]))
+                index += 1 + indices[index]
+            if restore:
+                instruction.gates, instruction.atoms = gates, indices[index:index + operands[2]]
+            index += operands[2]
+        elif opcode == SHUTTLE:
+            instruction = Shuttle(fpqa, bool(flags), operands[0], values[operands[1]])
+            if restore:
+                instruction.moved_atoms = [atom_by_id[atom_id] for atom_id in occupancy.line(bool(flags), operands[0])]
+        elif opcode == MULTI_SHUTTLE:
+            lines = indices[index:index + operands[0]]
+            offsets = [values[value] for value in indices[index + operands[0]:index + 2 * operands[0]]]
+            instruction = MultiShuttle(fpqa, bool(flags), lines, offsets)
+            if restore:
+                instruction.moved_atoms = [[atom_by_id[atom_id] for atom_id in occupancy.line(bool(flags), line)] for line in lines]
+            index += 2 * operands[0]
+        elif opcode == TRAP_TRANSFER:
+            instruction = TrapTransfer(fpqa, *operands)
+            if restore:
+                instruction.transferred_atoms = [atom_by_id[atom_id] for atom_id in occupancy.transfer(*operands)]
+        else:
+            raise ValueError(f"Unknown opcode in binary program: {opcode}")
+        # a completed block becomes an instruction of the enclosing one
+        while len(blocks) > 0:
+            size, instructions = blocks[-1]
+            instructions.append(instruction)
+            if len(instructions) < size:
+                break
+            instruction = Parallel(blocks.pop()[1])
+        else:
+            yield instruction
+    if len(blocks) > 0:
+        raise ValueError("Truncated parallel block in binary program.")
+
+def layout_header(fpqa: FPQA) -> dict:
+    return {
+        "atoms": [[atom.id, atom.is_slm, atom.row, atom.col] for atom in fpqa.atoms],
+        "aod_rows": fpqa.aod.rows.tolist(),
+        "aod_cols": fpqa.aod.cols.tolist()
+    }
+
+def program_header(fpqa: FPQA, initial_layout: dict, parameters: list[Parameter]) -> dict:
+    slm = fpqa.slm
+    if type(slm).__name__ not in SLM_LAYOUTS:
+        raise ValueError(f"Unsupported SLM layout in binary format: {type(slm).__name__}")
+    rows, cols = slm.occupancy.shape
+    return {
+        "version": FORMAT_VERSION,
+        "config": {key: getattr(fpqa.config, key) for key in defaults},
+        "verification": fpqa.verification,
+        "slm": {"layout": type(slm).__name__, "distance": slm.distance, "rows": rows, "cols": cols},
+        "initial_layout": initial_layout,
+        "final_layout": layout_header(fpqa),
+        "parameters": [[parameter.name, parameter.value] for parameter in parameters]
+    }
+
+def build_fpqa(header: dict, layout: str = "initial_layout") -> FPQA:
+    slm_header, layout = header["slm"], header[layout]
+    slm = SLM_LAYOUTS[slm_header["layout"]](slm_header["distance"], slm_header["rows"], slm_header["cols"])
+    aod = AOD(1.0, len(layout["aod_rows"]), len(layout["aod_cols"]))
+    aod.rows = np.array(layout["aod_rows"], dtype=float)
+    aod.cols = np.array(layout["aod_cols"], dtype=float)
+    atoms = [Atom(atom_id, is_slm, row, col) for atom_id, is_slm, row, col in layout["atoms"]]
+    return FPQA(slm, aod, atoms, FPQAConfig(header["config"]))
+
+def _padding(size: int) -> int:
+    return -size % _ALIGNMENT
+
+def write_binary(filename: str, header: dict, records: np.ndarray, values: np.ndarray, indices: np.ndarray):
+    header = dict(header, num_records=len(records), num_values=len(values), num_indices=len(indices))
+    encoded = json.dumps(header).encode()
+    encoded += b" " * _padding(len(MAGIC) + 8 + len(encoded))
+    with open(filename, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.array(len(encoded), dtype="<u8").tobytes())
+        f.write(encoded)
+        for table in (records, values, indices):
+            f.write(table.tobytes())
+            f.write(b"\x00" * _padding(table.nbytes))
+
+def read_binary(filename: str) -> tuple[dict, np.ndarray, np.ndarray, np.ndarray]:
+    # the tables are memory mapped, only the header is read eagerly
+    with open(filename, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a binary FPQA program: {filename}")
+        header_size = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+        header = json.loads(f.read(header_size))
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary program version: {header['version']}")
+    offset = len(MAGIC) + 8 + header_size
+    tables = []
+    for dtype, size in ((RECORD_DTYPE, header["num_records"]), (VALUE_DTYPE, header["num_values"]), (INDEX_DTYPE, header["num_indices"])):
+        if size == 0:
+            tables.append(np.zeros(0, dtype=dtype))
+        else:
+            tables.append(np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=(size,)))
+        offset += size * dtype.itemsize + _padding(size * dtype.itemsize)
+    return header, *tables
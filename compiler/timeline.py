@@ -0,0 +1,104 @@
+from nac.instructions.base import Instruction
+from nac.instructions.parallel import Parallel
+from nac.instructions.raman import LocalRaman, GlobalRaman
+from nac.instructions.rydberg import Rydberg
+from nac.instructions.multi_shuttle import MultiShuttle
+from nac.fpqa import FPQA
+from math import exp
+
+class Timeline:
+    # per atom schedule of a program: top level instructions run one after another and
+    # the instructions of a Parallel start together, a step lasts as long as its longest
+    # instruction, shuttles take |offset| / speed in either direction
+    def __init__(self, fpqa: FPQA):
+        self.fpqa = fpqa
+        # top level instructions, one step each
+        self.steps = []
+        self._reset()
+
+    def _reset(self):
+        self._scheduled = 0
+        self.time = 0.0
+        self._operations = {atom.id: [] for atom in self.fpqa.atoms}
+        self._gate_time = {atom.id: 0.0 for atom in self.fpqa.atoms}
+        self._critical_path = []
+
+    def _leaves(self, instruction: Instruction) -> list[Instruction]:
+        if type(instruction) is Parallel:
+            return [leaf for child in instruction.instructions for leaf in self._leaves(child)]
+        return [instruction]
+
+    def _schedule(self, step: Instruction):
+        config = self.fpqa.config
+        start, end, longest = self.time, self.time, None
+        for instruction in self._leaves(step):
+            duration = abs(instruction.duration())
+            if type(instruction) is Rydberg:
+                # atoms of a cz gate are done before the ccz gates of the same pulse
+                for gate in instruction.gates:
+                    gate_duration = config.CCZ_GATE_DURATION if len(gate) == 3 else config.CZ_GATE_DURATION
+                    for atom in gate:
+                        self._operations[atom].append((start, start + gate_duration, instruction))
+                        self._gate_time[atom] += gate_duration
+            elif type(instruction) is MultiShuttle:
+                # every line moves its atoms for as long as its own shuttle takes
+                durations = instruction.durations().tolist()
+                for line_duration, atoms in zip(durations, instruction.moved_atoms):
+                    for atom in atoms:
+                        self._operations[atom.id].append((start, start + line_duration, instruction))
+                duration = max(durations, default=0.0)
+            else:
+                is_gate = type(instruction) in (LocalRaman, GlobalRaman)
+                for atom in instruction.touched_atoms():
+                    self._operations[atom].append((start, start + duration, instruction))
+                    if is_gate:
+                        self._gate_time[atom] += duration
+            if longest is None or start + duration > end:
+                end, longest = start + duration, instruction
+        if longest is not None and end > start:
+            self._critical_path.append((start, end, longest))
+        self.time = end
+
+    def _catch_up(self):
+        # steps are scheduled once, when the timeline is first queried after they were added
+        while self._scheduled < len(self.steps):
+            self._schedule(self.steps[self._scheduled])
+            self._scheduled += 1
+
+    def add(self, instruction: Instruction):
+        self.steps.append(instruction)
+
+    def refresh(self):
+        # durations follow the config
+        self._reset()
+
+    def duration(self) -> float:
+        self._catch_up()
+        return self.time
+
+    def idle_times(self) -> dict[int, float]:
+        # time an atom spends outside of gates, moving atoms decohere like resting ones
+        self._catch_up()
+        return {atom: self.time - gate_time for atom, gate_time in self._gate_time.items()}
+
+    def operations(self, atom_id: int) -> list[tuple[float, float, Instruction]]:
+        # (start, end, instruction) of everything acting on the atom, in time order
+        self._catch_up()
+        return list(self._operations[atom_id])
+
+    def critical_path(self) -> list[tuple[float, float, Instruction]]:
+        # the instruction bounding the duration of every step with a nonzero duration
+        self._catch_up()
+        return list(self._critical_path)
+
+    def _efficient_coherence_time(self) -> float:
+        config = self.fpqa.config
+        return (config.QUBIT_DECAY * config.QUBIT_DEPHASING) / (config.QUBIT_DECAY + config.QUBIT_DEPHASING)
+
+    def coherence_fidelities(self) -> dict[int, float]:
+        coherence_time = self._efficient_coherence_time()
+        return {atom: exp(-idle_time / coherence_time) for atom, idle_time in self.idle_times().items()}
+
+    def coherence_fidelity(self) -> float:
+        # product of the per atom decoherence factors
+        return exp(-sum(self.idle_times().values()) / self._efficient_coherence_time())
@@ -0,0 +1,139 @@
+from nac.instructions.base import Instruction
+from nac.instructions.raman import LocalRaman, GlobalRaman
+from nac.instructions.rydberg import Rydberg
+from nac.instructions.parallel import Parallel
+from nac.instructions.shuttle import Shuttle
+from nac.instructions.trap_transfer import TrapTransfer
+from nac.fpqa import FPQA
+from nac.parameter import Parameter, ParameterExpression
+from typing import Iterable, Iterator
+
+class WqasmParser:
+    # line by line reader of the annotated OpenQASM FPQAProgram writes, the annotations
+    # carry the instructions and the statements following them are skipped, nothing but
+    # the open parallel blocks is kept between instructions
+    # the file does not describe the initial layout, the instructions refer to the traps
+    # and atoms of the given fpqa, which has to be in the state the program started from
+    def __init__(self, fpqa: FPQA, parameters: list[Parameter] | None = None):
+        self.fpqa = fpqa
+        self.parameters = [] if parameters is None else list(parameters)
+        self._parameter_by_name = {parameter.name: parameter for parameter in self.parameters}
+        self._atom_by_id = {atom.id: atom for atom in fpqa.atoms}
+
+    def _parameter(self, name: str) -> Parameter:
+        if name not in self._parameter_by_name:
+            raise ValueError(f"Undeclared parameter in wQASM: {name}")
+        return self._parameter_by_name[name]
+
+    def _angle(self, token: str) -> float | Parameter | ParameterExpression:
+        try:
+            return float(token)
+        except ValueError:
+            pass
+        if "*" in token:
+            scale, name = token.split("*", 1)
+            return ParameterExpression(self._parameter(name), float(scale))
+        return self._parameter(token)
+
+    def _angles(self, text: str) -> list:
+        # "(x, y, z)"
+        angles = text.strip()[1:-1].split(", ")
+        if len(angles) != 3:
+            raise ValueError(f"Expected three angles in wQASM: {text.strip()}")
+        return [self._angle(angle) for angle in angles]
+
+    def _atom_id(self, token: str) -> int:
+        # "q[id]"
+        return int(token.strip()[2:-1])
+
+    def _raman(self, fields: list[str]) -> Instruction:
+        if fields[0] == "global":
+            return GlobalRaman(self.fpqa, *self._angles(fields[1]))
+        atom, angles = fields[1].split(" ", 1)
+        return LocalRaman(self.fpqa, self._atom_by_id[self._atom_id(atom)], *self._angles(angles))
+
+    def _rydberg(self, lines: Iterator[str]) -> Instruction:
+        # gate <name> <atoms> { <one line per gate> }, the gates and atoms keep the order of the file
+        header = next(lines, "").strip()
+        if not header.startswith("gate ") or not header.endswith("{"):
+            raise ValueError(f"Expected a gate definition after @rydberg, got: {header}")
+        name, _, atoms = header[len("gate "):-1].strip().partition(" ")
+        instruction = Rydberg(self.fpqa)
+        instruction.gate_name = name
+        instruction.atoms = [int(atom) for atom in atoms.split(", ")] if atoms else []
+        instruction.gates = []
+        for line in lines:
+            line = line.strip()
+            if line == "}":
+                break
+            operands = line[line.index(" q[") + 1:].rstrip(";")
+            instruction.gates.append(tuple(self._atom_id(atom) for atom in operands.split(", ")))
+        else:
+            raise ValueError(f"Unterminated gate definition of {name}")
+        return instruction
+
+    def _shuttle(self, fields: list[str]) -> Instruction:
+        if fields[0] not in ("row", "col"):
+            raise ValueError(f"Unknown shuttle direction in wQASM: {fields[0]}")
+        index, offset = fields[1].split()
+        return Shuttle(self.fpqa, fields[0] == "row", int(index), float(offset))
+
+    def _transfer(self, fields: list[str]) -> Instruction:
+        # slm traps are numbered column by column
+        slm_col, slm_row = divmod(int(fields[0]), len(self.fpqa.slm.traps))
+        aod_col, aod_row = fields[1].strip()[1:-1].split(", ")
+        return TrapTransfer(self.fpqa, slm_row, slm_col, int(aod_row), int(aod_col))
+
+    def parse(self, lines: Iterable[str]) -> Iterator[Instruction]:
+        # yields the top level instructions as they are completed, in program order, with
+        # the gates and atoms of the rydberg pulses set as written
+        lines = iter(lines)
+        blocks = []
+        for line in lines:
+            if line.startswith("@"):
+                directive, _, rest = line.rstrip("\n").partition(" ")
+                fields = rest.split(" ", 1)
+                if directive == "@parallel":
+                    if fields[0] == "begin":
+                        blocks.append([])
+                        continue
+                    if fields[0] != "end" or len(blocks) == 0:
+                        raise ValueError(f"Unmatched parallel block in wQASM: {line.strip()}")
+                    instruction = Parallel(blocks.pop())
+                elif directive == "@shuttle":
+                    instruction = self._shuttle(fields)
+                elif directive == "@transfer":
+                    instruction = self._transfer(fields)
+                elif directive == "@raman":
+                    instruction = self._raman(fields)
+                elif directive == "@rydberg":
+                    instruction = self._rydberg(lines)
+                elif directive in ("@slm", "@aod", "@bind"):
+                    # the initial layout, which is the fpqa's
+                    continue
+                else:
+                    raise ValueError(f"Unknown wQASM annotation: {directive}")
+            elif line.startswith("input float[64] "):
+                name = line[len("input float[64] "):].strip().rstrip(";")
+                if name not in self._parameter_by_name:
+                    self._parameter_by_name[name] = Parameter(name)
+                    self.parameters.append(self._parameter_by_name[name])
+                continue
+            elif line.startswith("qubit["):
+                num_qubits = int(line[len("qubit["):].split("]", 1)[0])
+                if num_qubits != len(self.fpqa.atoms):
+                    raise ValueError(f"Program has {num_qubits} qubits, the FPQA {len(self.fpqa.atoms)} atoms.")
+                continue
+            else:
+                continue
+            if len(blocks) > 0:
+                blocks[-1].append(instruction)
+            else:
+                yield instruction
+        if len(blocks) > 0:
+            raise ValueError("Unterminated parallel block in wQASM.")
+
+def rydberg_pulses(instruction: Instruction) -> list[Rydberg]:
+    if type(instruction) is Parallel:
+        return [pulse for child in instruction.instructions for pulse in rydberg_pulses(child)]
+    return [instruction] if type(instruction) is Rydberg else []
@@ -1,22 +1,34 @@
 from nac.atom import Atom
+import numpy as np
 
 class AOD:
     def __init__(self,  distance: float, rows: int, cols: int):
-        self.rows = [distance * row for row in range(rows)]
-        self.cols = [distance * col for col in range(cols)]
-        self.atom_map = [[None for _ in range(cols)] for _ in range(rows)]
+        self.rows = distance * np.arange(rows, dtype=float)
+        self.cols = distance * np.arange(cols, dtype=float)
+        # atom ids per trap, -1 marks an empty trap
+        self.occupancy = np.full((rows, cols), -1, dtype=np.int32)
+        self.atoms = {}
 
     def set_trap(self, x: int, y: int, atom: Atom | None):
-        self.atom_map[y][x] = atom
-        if atom is not None:
-            atom.assign_trap(False, y, x)
+        if atom is None:
+            self.occupancy[y, x] = -1
+            return
+        self.occupancy[y, x] = atom.id
+        self.atoms[atom.id] = atom
+        atom.assign_trap(False, y, x)
 
     def get_atom_at_trap(self, x: int, y: int) -> Atom | None:
-        return self.atom_map[y][x]
+        atom_id = int(self.occupancy[y, x])
+        return self.atoms[atom_id] if atom_id >= 0 else None
 
     def occupied(self, x: int, y: int) -> bool:
-        return self.atom_map[y][x] != None
+        return self.occupancy[y, x] >= 0
 
-    def position(self, x: int, y: int) -> tuple[int]:
-        return self.cols[x], self.rows[y]
-    
\ No newline at end of file
+    def position(self, x: int, y: int) -> tuple[float, float]:
+        return float(self.cols[x]), float(self.rows[y])
+
+    def atoms_in_row(self, y: int) -> list[Atom]:
+        return [self.atoms[atom_id] for atom_id in self.occupancy[y].tolist() if atom_id >= 0]
+
+    def atoms_in_col(self, x: int) -> list[Atom]:
+        return [self.atoms[atom_id] for atom_id in self.occupancy[:, x].tolist() if atom_id >= 0]
@@ -1,4 +1,6 @@
 class Atom:
+    __slots__ = ("id", "is_slm", "row", "col")
+
     def __init__(self, id: int, is_slm: bool, row: int, col: int):
         self.id = id
         self.is_slm = is_slm
@@ -9,5 +11,3 @@ class Atom:
         self.is_slm = is_slm
         self.row = row
         self.col = col
-        
-        
\ No newline at end of file
@@ -1,14 +1,30 @@
-from math import pow, sqrt
+from math import floor, nextafter, inf, sqrt
 from nac.atom import Atom
 from nac.slm.base import SLM
 from nac.aod import AOD
 from nac.config import FPQAConfig
+import numpy as np
+
+def _squared_radius(radius: float) -> float:
+    # largest squared distance d with sqrt(d) <= radius, so that squared comparisons
+    # agree exactly with the distance based check
+    squared = radius * radius
+    while sqrt(nextafter(squared, inf)) <= radius:
+        squared = nextafter(squared, inf)
+    return squared
+
+VERIFICATION_LEVELS = ("full", "cheap", "off")
 
 class FPQA:
     def __init__(self,  slm: SLM, aod: AOD, atoms: list[Atom], config: FPQAConfig):
         self.aod = aod
         self.slm = slm
         self.atoms = atoms
+        self.atom_index = {}
+        for i, atom in enumerate(self.atoms):
+            if atom.id in self.atom_index:
+                raise ValueError(f"Duplicate atom id: {atom.id}")
+            self.atom_index[atom.id] = i
         for atom in self.atoms:
             if atom.is_slm:
                 if self.slm.occupied(atom.col, atom.row):
@@ -19,24 +35,123 @@ class FPQA:
                     raise ValueError("AOD Trap already occupied.")
                 self.aod.set_trap(atom.col, atom.row, atom)
         self.config = config
+        self.verification = "full"
+        self.positions = np.array([self._trap_position(atom) for atom in self.atoms], dtype=float).reshape(len(self.atoms), 2)
 
     def get_atom(self, index: int) -> Atom:
         return self.atoms[index]
 
-    def is_interacting(self, atom1: Atom, atom2: Atom) -> bool:
-        pos1 = 0.0, 0.0
-        if atom1.is_slm:
-            pos1 = self.slm.position(atom1.col, atom1.row)
+    def get_atom_by_id(self, atom_id: int) -> Atom | None:
+        index = self.atom_index.get(atom_id)
+        return self.atoms[index] if index is not None else None
+
+    def set_verification(self, level: str):
+        if level not in VERIFICATION_LEVELS:
+            raise ValueError(f"Unknown verification level: {level}")
+        self.verification = level
+
+    def is_trapped(self, atom: Atom) -> bool:
+        if atom.is_slm:
+            return self.slm.get_atom_at_trap(atom.col, atom.row) is atom
+        return self.aod.get_atom_at_trap(atom.col, atom.row) is atom
+
+    def _trap_position(self, atom: Atom) -> tuple[float, float]:
+        if atom.is_slm:
+            return self.slm.position(atom.col, atom.row)
+        return self.aod.position(atom.col, atom.row)
+
+    def position(self, atom: Atom) -> tuple[float, float]:
+        x, y = self.positions[self.atom_index[atom.id]]
+        return float(x), float(y)
+
+    def update_position(self, atom: Atom):
+        self.positions[self.atom_index[atom.id]] = self._trap_position(atom)
+
+    def move_aod_line(self, is_row: bool, index: int, offset: float) -> list[Atom]:
+        if is_row:
+            self.aod.rows[index] += offset
+            atoms = self.aod.atoms_in_row(index)
+            for atom in atoms:
+                self.positions[self.atom_index[atom.id], 1] = self.aod.rows[index]
         else:
-            pos1 = self.aod.position(atom1.col, atom1.row)
-        pos2 = 0.0, 0.0
-        if atom2.is_slm:
-            pos2 = self.slm.position(atom2.col, atom2.row)
+            self.aod.cols[index] += offset
+            atoms = self.aod.atoms_in_col(index)
+            for atom in atoms:
+                self.positions[self.atom_index[atom.id], 0] = self.aod.cols[index]
+        return atoms
+
+    def move_aod_lines(self, is_row: bool, indices: np.ndarray, offsets: np.ndarray) -> list[list[Atom]]:
+        # move_aod_line for several distinct lines at once, returns the moved atoms per line
+        lines = self.aod.rows if is_row else self.aod.cols
+        lines[indices] += offsets
+        occupancy = self.aod.occupancy[indices] if is_row else self.aod.occupancy[:, indices].T
+        moved = occupancy >= 0
+        atom_ids = occupancy[moved].tolist()
+        if len(atom_ids) > 0:
+            rows = [self.atom_index[atom_id] for atom_id in atom_ids]
+            self.positions[rows, 1 if is_row else 0] = np.repeat(lines[indices], moved.sum(axis=1))
+        return [[self.aod.atoms[atom_id] for atom_id in line if atom_id >= 0] for line in occupancy.tolist()]
+
+    def is_interacting(self, atom1: Atom, atom2: Atom) -> bool:
+        x1, y1 = self.position(atom1)
+        x2, y2 = self.position(atom2)
+        dx = x1 - x2
+        dy = y1 - y2
+        return dx * dx + dy * dy <= _squared_radius(self.config.INTERACTION_RADIUS)
+
+    def interacting_pairs(self, method: str = "grid") -> list[tuple[int, int]]:
+        if method == "grid":
+            pairs = self._grid_interacting_pairs()
+        elif method == "numpy":
+            pairs = self._numpy_interacting_pairs()
         else:
-            pos2 = self.aod.position(atom2.col, atom2.row)
-        dx = pos1[0] - pos2[0]
-        dy = pos1[1] - pos2[1]
-        distance = sqrt(dx * dx + dy * dy)
-        return distance <= self.config.INTERACTION_RADIUS
-        
-            
\ No newline at end of file
+            raise ValueError(f"Unknown interaction method: {method}")
+        # same order as a pairwise sweep over self.atoms
+        index = {atom.id: i for i, atom in enumerate(self.atoms)}
+        pairs.sort(key=lambda pair: (min(index[pair[0]], index[pair[1]]), max(index[pair[0]], index[pair[1]])))
+        return pairs
+
+    def _grid_interacting_pairs(self) -> list[tuple[int, int]]:
+        radius = self.config.INTERACTION_RADIUS
+        squared_radius = _squared_radius(radius)
+        # cells marginally larger than the radius keep interacting atoms in neighbouring cells
+        cell_size = radius * (1.0 + 1e-09)
+        cells = {}
+        for atom, (x, y) in zip(self.atoms, self.positions.tolist()):
+            cells.setdefault((floor(x / cell_size), floor(y / cell_size)), []).append((atom.id, x, y))
+        pairs = []
+        for (cx, cy), cell in cells.items():
+            for i, (id1, x1, y1) in enumerate(cell):
+                for id2, x2, y2 in cell[i + 1:]:
+                    dx, dy = x1 - x2, y1 - y2
+                    if dx * dx + dy * dy <= squared_radius:
+                        pairs.append((id1, id2) if id1 < id2 else (id2, id1))
+            # half of the neighbourhood, every pair of cells is visited once
+            for neighbor in ((cx + 1, cy - 1), (cx + 1, cy), (cx + 1, cy + 1), (cx, cy + 1)):
+                if neighbor not in cells:
+                    continue
+                for id1, x1, y1 in cell:
+                    for id2, x2, y2 in cells[neighbor]:
+                        dx, dy = x1 - x2, y1 - y2
+                        if dx * dx + dy * dy <= squared_radius:
+                            pairs.append((id1, id2) if id1 < id2 else (id2, id1))
+        return pairs
+
+    def _numpy_interacting_pairs(self) -> list[tuple[int, int]]:
+        if len(self.atoms) < 2:
+            return []
+        radius = self.config.INTERACTION_RADIUS
+        ids = np.array([atom.id for atom in self.atoms])
+        positions = self.positions
+        order = np.argsort(positions[:, 0], kind="stable")
+        ids, positions = ids[order], positions[order]
+        # sweep along x: every atom is only compared with the atoms inside its x window
+        ends = np.searchsorted(positions[:, 0], positions[:, 0] + radius * (1.0 + 1e-09), side="right")
+        counts = ends - np.arange(len(ids)) - 1
+        first = np.repeat(np.arange(len(ids)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = first + 1 + offsets
+        delta = positions[first] - positions[second]
+        close = np.einsum("ij,ij->i", delta, delta) <= _squared_radius(radius)
+        id1, id2 = ids[first[close]], ids[second[close]]
+        return list(zip(np.minimum(id1, id2).tolist(), np.maximum(id1, id2).tolist()))
@@ -6,19 +6,19 @@ class AODInit(Instruction):
         self.fpqa = fpqa
 
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply aod init in current FPQA setting")
 
     def verify(self) -> bool:
         return True
 
     def qasm(self) -> str:
-        rows = f"[{', '.join(self.fpqa.aod.rows)}]"
-        cols = f"[{', '.join(self.fpqa.aod.cols)}]"
+        rows = f"[{', '.join(map(str, self.fpqa.aod.rows.tolist()))}]"
+        cols = f"[{', '.join(map(str, self.fpqa.aod.cols.tolist()))}]"
         return f"@aod {cols} {rows}"
 
     def avg_fidelity(self) -> float:
         return 1.0
 
-    def duration() -> float:
+    def duration(self) -> float:
         return 0.0
\ No newline at end of file
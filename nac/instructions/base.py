@@ -22,4 +22,9 @@ class Instruction(ABC):
     def duration() -> float:
         pass
 
-    
\ No newline at end of file
+    def count_ops(self) -> dict[str, int]:
+        return {}
+
+    # ids of the atoms the instruction acted on when it was applied
+    def touched_atoms(self) -> set[int]:
+        return set()
@@ -12,21 +12,20 @@ class Bind(Instruction):
         self.col = col
 
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply bind in current FPQA setting")
         if self.is_slm:
             self.fpqa.slm.set_trap(self.col, self.row, self.atom)
         else:
             self.fpqa.aod.set_trap(self.col, self.row, self.atom)
+        self.fpqa.update_position(self.atom)
 
     def verify(self) -> bool:
-        if atom.is_slm and self.fpqa.slm.get_atom_at_trap(self.col, self.row) is not None:
-            return False
-        if not atom.is_slm and self.aod.get_atom_at_trap(self.col, self.row) is not None:
+        if self.fpqa.get_atom_by_id(self.atom.id) is not self.atom:
             return False
         if self.is_slm:
-            return self._verify_slm()
-        return self._verify_aod()
+            return self._verify_slm() and not self.fpqa.slm.occupied(self.col, self.row)
+        return self._verify_aod() and not self.fpqa.aod.occupied(self.col, self.row)
 
     def _verify_aod(self) -> bool:
         return (self.row >= 0 and self.row < len(self.fpqa.aod.rows) and 
@@ -37,7 +36,7 @@ class Bind(Instruction):
 
     def qasm(self) -> str:
         trap_type = "slm" if self.is_slm else "aod"
-        index =  self.col * len(self.slm.traps) + self.row if self.is_slm else f"({self.col}, {self.row})"
+        index =  self.col * len(self.fpqa.slm.traps) + self.row if self.is_slm else f"({self.col}, {self.row})"
         return f"@bind {self.qid} {trap_type} {index}"
 
     def avg_fidelity(self) -> float:
@@ -0,0 +1,60 @@
+from nac.instructions.base import Instruction
+from nac.instructions.shuttle import Shuttle
+from nac.fpqa import FPQA
+import numpy as np
+
+class MultiShuttle(Instruction):
+    # shuttles of several aod rows or columns by their own offsets at once, equivalent to a
+    # Parallel of one Shuttle per line in the given order, which is also what qasm() writes
+    def __init__(self, fpqa: FPQA, is_row: bool, indices: np.ndarray, offsets: np.ndarray):
+        self.fpqa = fpqa
+        self.is_row = is_row
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=float)
+        if self.indices.shape != self.offsets.shape or self.indices.ndim != 1:
+            raise ValueError("Expected one offset per aod line.")
+        if len(np.unique(self.indices)) != len(self.indices):
+            raise ValueError("Cannot shuttle an aod line twice at once.")
+
+    def apply(self):
+        # atoms moved per line, in the order of the lines
+        self.moved_atoms = self.fpqa.move_aod_lines(self.is_row, self.indices, self.offsets)
+
+    def verify(self) -> bool:
+        # the lines have to keep their order and stay apart by the beam proximity after the move,
+        # up to the rounding of lines placed exactly that far apart
+        lines = (self.fpqa.aod.rows if self.is_row else self.fpqa.aod.cols).copy()
+        lines[self.indices] += self.offsets
+        return bool(np.all(np.diff(lines) >= self.fpqa.config.AOD_BEAM_PROXIMITY - 1e-09))
+
+    def qasm(self) -> str:
+        array_type = "row" if self.is_row else "col"
+        shuttles = [f"@shuttle {array_type} {index} {offset}\n" for index, offset in zip(self.indices.tolist(), self.offsets.tolist())]
+        return "".join(["@parallel begin\n", *shuttles, "@parallel end\n"])
+
+    def avg_fidelity(self) -> float:
+        # multiplied line by line, like the fidelity of a Parallel
+        if len(self.indices) == 0:
+            return 1.0
+        return float(np.multiply.accumulate(np.full(len(self.indices), self.fpqa.config.SHUTTLING_FIDELITY))[-1])
+
+    def duration(self) -> float:
+        if len(self.indices) == 0:
+            return 0.0
+        return max(0.0, float(np.max(self.offsets / self.fpqa.config.SHUTTLING_SPEED)))
+
+    def durations(self) -> np.ndarray:
+        # the duration of every line's move
+        return np.abs(self.offsets / self.fpqa.config.SHUTTLING_SPEED)
+
+    def touched_atoms(self) -> set[int]:
+        return {atom.id for atoms in self.moved_atoms for atom in atoms}
+
+    def shuttles(self) -> list[Shuttle]:
+        # the equivalent single line shuttles, in the state apply() left
+        shuttles = []
+        for index, offset, atoms in zip(self.indices.tolist(), self.offsets.tolist(), self.moved_atoms):
+            shuttle = Shuttle(self.fpqa, self.is_row, index, offset)
+            shuttle.moved_atoms = atoms
+            shuttles.append(shuttle)
+        return shuttles
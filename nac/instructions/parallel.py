@@ -29,4 +29,17 @@ class Parallel(Instruction):
         duration = 0.0
         for instruction in self.instructions:
             duration = max(duration, instruction.duration())
-        return duration
\ No newline at end of file
+        return duration
+
+    def count_ops(self) -> dict[str, int]:
+        ops = {}
+        for instruction in self.instructions:
+            for op, count in instruction.count_ops().items():
+                ops[op] = ops.get(op, 0) + count
+        return ops
+
+    def touched_atoms(self) -> set[int]:
+        atoms = set()
+        for instruction in self.instructions:
+            atoms.update(instruction.touched_atoms())
+        return atoms
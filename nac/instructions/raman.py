@@ -11,15 +11,15 @@ class LocalRaman(Instruction):
         self.z_angle = z_angle
     
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply local Raman pulse in current FPQA setting.")
 
     def verify(self) -> bool:
-        count = 0
-        for atom in self.fpqa.atoms:
-            if atom == self.atom:
-                count += 1
-        return count == 1
+        if self.fpqa.get_atom_by_id(self.atom.id) is not self.atom:
+            return False
+        if self.fpqa.verification == "full":
+            return self.fpqa.is_trapped(self.atom)
+        return True
 
     def qasm(self) -> str:
         lines = [f"@raman local q[{self.atom.id}] ({self.x_angle}, {self.y_angle}, {self.z_angle})",
@@ -32,6 +32,12 @@ class LocalRaman(Instruction):
     def duration(self) -> float:
         return self.fpqa.config.U3_GATE_DURATION
 
+    def count_ops(self) -> dict[str, int]:
+        return {"u3": 1}
+
+    def touched_atoms(self) -> set[int]:
+        return {self.atom.id}
+
 class GlobalRaman(Instruction):
     def __init__(self, fpqa: FPQA, x_angle: float, y_angle: float, z_angle: float):
         self.fpqa = fpqa
@@ -40,7 +46,7 @@ class GlobalRaman(Instruction):
         self.z_angle = z_angle
     
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply global Raman pulse in current FPQA setting.")
 
     def verify(self) -> bool:
@@ -56,4 +62,10 @@ class GlobalRaman(Instruction):
         return self.fpqa.config.U3_GATE_FIDELITY ** len(self.fpqa.atoms)
 
     def duration(self) -> float:
-        return self.fpqa.config.U3_GATE_DURATION
\ No newline at end of file
+        return self.fpqa.config.U3_GATE_DURATION
+
+    def count_ops(self) -> dict[str, int]:
+        return {"u3": len(self.fpqa.atoms)}
+
+    def touched_atoms(self) -> set[int]:
+        return {atom.id for atom in self.fpqa.atoms}
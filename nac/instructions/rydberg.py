@@ -10,7 +10,7 @@ class Rydberg(Instruction):
         Rydberg._global_rydberg_gate_id += 1
         
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply global Rydberg pulse in current FPQA setting.")
         self.gates, self.atoms = self.get_gates_and_atoms()
 
@@ -44,17 +44,23 @@ class Rydberg(Instruction):
                 return self.fpqa.config.CCZ_GATE_DURATION
         return self.fpqa.config.CZ_GATE_DURATION
 
+    def count_ops(self) -> dict[str, int]:
+        ops = {"cz": 0, "ccz": 0}
+        for gate in self.gates:
+            if len(gate) == 2:
+                ops["cz"] += 1
+            if len(gate) == 3:
+                ops["ccz"] += 1
+        return ops
+
+    def touched_atoms(self) -> set[int]:
+        return set(self.atoms)
+
     def get_gates_and_atoms(self) -> tuple[set, set]:
         parents = {atom.id: set([atom.id]) for atom in self.fpqa.atoms}
-        for i in range(len(self.fpqa.atoms)):
-            for j in range(i + 1, len(self.fpqa.atoms)):
-                atom1 = self.fpqa.atoms[i]
-                atom2 = self.fpqa.atoms[j]
-                if atom2.id < atom1.id:
-                    atom1, atom2 = atom2, atom1
-                if self.fpqa.is_interacting(atom1, atom2):
-                    parents[atom2.id] = parents[atom1.id]
-                    parents[atom1.id].add(atom2.id)
+        for atom1, atom2 in self.fpqa.interacting_pairs():
+            parents[atom2] = parents[atom1]
+            parents[atom1].add(atom2)
         gates = set()
         atoms = set()
         for atom in parents:
@@ -65,6 +71,3 @@ class Rydberg(Instruction):
                 gates.add(tuple(parents[atom]))
                 atoms = atoms.union(parents[atom])
         return gates, atoms
-            
-                
-    
\ No newline at end of file
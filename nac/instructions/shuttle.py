@@ -11,10 +11,7 @@ class Shuttle(Instruction):
     def apply(self):
         #if not self.verify():
         #    raise ValueError("Cannot apply shuttle in current FPQA setting")
-        if self.is_row:
-            self.fpqa.aod.rows[self.index] += self.offset
-        else:
-            self.fpqa.aod.cols[self.index] += self.offset
+        self.moved_atoms = self.fpqa.move_aod_line(self.is_row, self.index, self.offset)
     
     def verify(self) -> bool:
         if self.is_row:
@@ -57,4 +54,7 @@ class Shuttle(Instruction):
         return self.fpqa.config.SHUTTLING_FIDELITY
 
     def duration(self) -> float:
-        return self.offset / self.fpqa.config.SHUTTLING_SPEED
\ No newline at end of file
+        return self.offset / self.fpqa.config.SHUTTLING_SPEED
+
+    def touched_atoms(self) -> set[int]:
+        return {atom.id for atom in self.moved_atoms}
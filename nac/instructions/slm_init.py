@@ -6,7 +6,7 @@ class SLMInit(Instruction):
         self.fpqa = fpqa
 
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply slm init in current FPQA setting")
 
     def verify(self) -> bool:
@@ -20,5 +20,5 @@ class SLMInit(Instruction):
     def avg_fidelity(self) -> float:
         return 1.0
 
-    def duration() -> float:
+    def duration(self) -> float:
         return 0.0
\ No newline at end of file
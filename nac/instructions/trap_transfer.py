@@ -10,18 +10,23 @@ class TrapTransfer(Instruction):
         self.aod_col = aod_col
     
     def apply(self):
-        if not self.verify():
+        if self.fpqa.verification != "off" and not self.verify():
             raise ValueError("Cannot apply trap transfer in current FPQA setting.")
         slm_atom = self.fpqa.slm.get_atom_at_trap(self.slm_col, self.slm_row)
         aod_atom = self.fpqa.aod.get_atom_at_trap(self.aod_col, self.aod_row)
         self.fpqa.slm.set_trap(self.slm_col, self.slm_row, aod_atom)
         self.fpqa.aod.set_trap(self.aod_col, self.aod_row, slm_atom)
+        self.transferred_atoms = [atom for atom in (slm_atom, aod_atom) if atom is not None]
+        for atom in self.transferred_atoms:
+            self.fpqa.update_position(atom)
 
     def verify(self) -> bool:
         if self.fpqa.slm.occupied(self.slm_col, self.slm_row) and self.fpqa.aod.occupied(self.aod_col, self.aod_row):
             return False
         if not self.fpqa.slm.occupied(self.slm_col, self.slm_row) and not self.fpqa.aod.occupied(self.aod_col, self.aod_row):
             return False
+        if self.fpqa.verification != "full":
+            return True
         slm_pos_x, slm_pos_y = self.fpqa.slm.position(self.slm_col, self.slm_row)
         aod_pos_x, aod_pos_y = self.fpqa.aod.position(self.aod_col, self.aod_row)
         dx, dy = slm_pos_x - aod_pos_x, slm_pos_y - aod_pos_y
@@ -38,4 +43,7 @@ class TrapTransfer(Instruction):
         return self.fpqa.config.TRAP_SWAP_FIDELITY
 
     def duration(self) -> float:
-        return self.fpqa.config.TRAP_SWAP_DURATION
\ No newline at end of file
+        return self.fpqa.config.TRAP_SWAP_DURATION
+
+    def touched_atoms(self) -> set[int]:
+        return {atom.id for atom in self.transferred_atoms}
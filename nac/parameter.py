@@ -0,0 +1,62 @@
+class Parameter:
+    # numpy scalars defer to __rmul__ instead of treating the parameter as an array
+    __array_ufunc__ = None
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = None
+
+    def bind(self, value: float | None):
+        self.value = value
+
+    def is_bound(self) -> bool:
+        return self.value is not None
+
+    def __mul__(self, other: float) -> "ParameterExpression":
+        return ParameterExpression(self, other)
+
+    def __rmul__(self, other: float) -> "ParameterExpression":
+        return ParameterExpression(self, other)
+
+    def __neg__(self) -> "ParameterExpression":
+        return ParameterExpression(self, -1.0)
+
+    def __float__(self) -> float:
+        if self.value is None:
+            raise ValueError(f"Parameter {self.name} is not bound.")
+        return float(self.value)
+
+    def __str__(self) -> str:
+        return str(float(self)) if self.is_bound() else self.name
+
+    def __format__(self, format_spec: str) -> str:
+        return format(float(self), format_spec) if self.is_bound() else self.name
+
+class ParameterExpression:
+    __array_ufunc__ = None
+
+    def __init__(self, parameter: Parameter, scale: float):
+        self.parameter = parameter
+        self.scale = scale
+
+    def is_bound(self) -> bool:
+        return self.parameter.is_bound()
+
+    def __mul__(self, other: float) -> "ParameterExpression":
+        return ParameterExpression(self.parameter, self.scale * other)
+
+    def __rmul__(self, other: float) -> "ParameterExpression":
+        return ParameterExpression(self.parameter, other * self.scale)
+
+    def __neg__(self) -> "ParameterExpression":
+        return ParameterExpression(self.parameter, -self.scale)
+
+    def __float__(self) -> float:
+        # same rounding as multiplying the scale with a plain float angle
+        return float(self.scale * float(self.parameter))
+
+    def __str__(self) -> str:
+        return str(float(self)) if self.is_bound() else f"{self.scale}*{self.parameter.name}"
+
+    def __format__(self, format_spec: str) -> str:
+        return format(float(self), format_spec) if self.is_bound() else f"{self.scale}*{self.parameter.name}"
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from nac.atom import Atom
 from nac.slm.trap import Trap
+import numpy as np
 
 class SLM(ABC):
     @abstractmethod
@@ -21,4 +22,62 @@ class SLM(ABC):
 
     @abstractmethod
     def trap_list(self) -> list[Trap]:
-        pass
\ No newline at end of file
+        pass
+
+class _TrapRow:
+    def __init__(self, slm: "GridLayout", row: int):
+        self.slm = slm
+        self.row = row
+
+    def __len__(self) -> int:
+        return self.slm.occupancy.shape[1]
+
+    def __getitem__(self, col: int) -> Trap:
+        x, y = self.slm.position(col, self.row)
+        return Trap(x, y, self.slm.get_atom_at_trap(col, self.row))
+
+class _TrapRows:
+    def __init__(self, slm: "GridLayout"):
+        self.slm = slm
+
+    def __len__(self) -> int:
+        return self.slm.occupancy.shape[0]
+
+    def __getitem__(self, row: int) -> _TrapRow:
+        return _TrapRow(self.slm, row)
+
+class GridLayout(SLM):
+    # trap coordinates and occupancy are kept in arrays, Trap objects are only created
+    # on demand as read-only snapshots through traps[row][col]
+    def __init__(self, x: np.ndarray, y: np.ndarray):
+        self.x = x
+        self.y = y
+        # atom ids per trap, -1 marks an empty trap
+        self.occupancy = np.full(x.shape, -1, dtype=np.int32)
+        self.atoms = {}
+        self.traps = _TrapRows(self)
+
+    def set_trap(self, x: int, y: int, atom: Atom | None):
+        if atom is None:
+            self.occupancy[y, x] = -1
+            return
+        self.occupancy[y, x] = atom.id
+        self.atoms[atom.id] = atom
+        atom.assign_trap(True, y, x)
+
+    def get_atom_at_trap(self, x: int, y: int) -> Atom | None:
+        atom_id = int(self.occupancy[y, x])
+        return self.atoms[atom_id] if atom_id >= 0 else None
+
+    def occupied(self, x: int, y: int) -> bool:
+        return self.occupancy[y, x] >= 0
+
+    def position(self, x: int, y: int) -> tuple[float, float]:
+        return float(self.x[y, x]), float(self.y[y, x])
+
+    def trap_list(self) -> list[Trap]:
+        return [
+            self.traps[row][col]
+            for row in range(self.occupancy.shape[0])
+            for col in range(self.occupancy.shape[1])
+        ]
@@ -1,8 +1,7 @@
-from nac.slm.base import SLM
-from nac.slm.trap import Trap
-from nac.atom import Atom
+from nac.slm.base import GridLayout
+import numpy as np
 
-class SquareGrid(SLM):
+class SquareGrid(GridLayout):
     def __init__(self, distance: float, rows: int, cols: int):
         if distance <= 0:
             raise ValueError("Invalid distance.")
@@ -10,30 +9,7 @@ class SquareGrid(SLM):
             raise ValueError("Invalid number of rows.")
         if cols <= 0:
             raise ValueError("Invalid number of cols.")
-        self.traps = [
-            [
-                Trap(distance * col, distance * row, None) 
-                for col in range(cols)
-            ]
-            for row in range(rows)
-        ]
-
-    def set_trap(self, x: int, y: int, atom: Atom | None):
-        self.traps[y][x].atom = atom
-
-    def get_atom_at_trap(self, x: int, y: int) -> Atom | None:
-        return self.traps[y][x]
-
-    def occupied(self, x: int, y: int) -> bool:
-        return self.traps[y][x].atom != None
-
-    def position(self, x: int, y: int) -> tuple[int]:
-        return self.traps[y][x].x, self.traps[y][x].y
-
-    def trap_list(self) -> list[Trap]:
-        return [
-            trap 
-            for trap in column 
-            for column in self.traps
-        ]
-        
\ No newline at end of file
+        self.distance = distance
+        x = np.broadcast_to(np.arange(cols, dtype=float) * distance, (rows, cols))
+        y = np.broadcast_to((np.arange(rows, dtype=float) * distance)[:, None], (rows, cols))
+        super().__init__(x, y)
@@ -1,7 +1,16 @@
 from nac.atom import Atom
 
 class Trap:
+    # read-only snapshot of an slm trap, traps are changed through the slm's set_trap
+    __slots__ = ("x", "y", "atom")
+
     def __init__(self, x: float, y: float, atom: Atom | None):
-        self.x = x
-        self.y = y
-        self.atom = atom
\ No newline at end of file
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "y", y)
+        object.__setattr__(self, "atom", atom)
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError(f"Trap snapshots are read-only, use the SLM's set_trap to change {name}.")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"Trap snapshots are read-only, use the SLM's set_trap to change {name}.")
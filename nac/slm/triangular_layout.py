@@ -1,9 +1,8 @@
 from math import sqrt
-from nac.slm.base import SLM
-from nac.slm.trap import Trap
-from nac.atom import Atom
+from nac.slm.base import GridLayout
+import numpy as np
 
-class TriangularLayout(SLM):
+class TriangularLayout(GridLayout):
     def __init__(self, distance: float, rows: int, cols: int):
         if distance <= 0:
             raise ValueError("Invalid distance.")
@@ -11,32 +10,9 @@ class TriangularLayout(SLM):
             raise ValueError("Invalid number of rows.")
         if cols <= 0:
             raise ValueError("Invalid number of cols.")
+        self.distance = distance
         xy_distance = distance / sqrt(2)
-        self.traps = [
-            [
-                Trap(col * distance + xy_distance if row % 2 == 1 else col * distance, row * xy_distance, None) 
-                for col in range(cols)
-            ] 
-            for row in range(rows)
-        ]
-
-    def set_trap(self, x: int, y: int, atom: Atom | None):
-        self.traps[y][x].atom = atom
-        if atom is not None:
-            atom.assign_trap(True, y, x)
-
-    def get_atom_at_trap(self, x: int, y: int) -> Atom | None:
-        return self.traps[y][x].atom
-
-    def occupied(self, x: int, y: int) -> bool:
-        return self.traps[y][x].atom != None
-
-    def position(self, x: int, y: int) -> tuple[int]:
-        return self.traps[y][x].x, self.traps[y][x].y
-
-    def trap_list(self) -> list[Trap]:
-        return [
-            trap 
-            for trap in column 
-            for column in self.traps
-        ]
+        x = np.tile(np.arange(cols, dtype=float) * distance, (rows, 1))
+        x[1::2] += xy_distance
+        y = np.broadcast_to((np.arange(rows, dtype=float) * xy_distance)[:, None], (rows, cols))
+        super().__init__(x, y)
@@ -0,0 +1,42 @@
+from compiler import cache
+from compiler.cache import CompilationCache
+from compiler.entrypoint import Max3satQaoaCompiler
+from nac.config import FPQAConfig
+from pysat.formula import CNF
+import os
+import shutil
+
+FORMULA = [[1, 2, 3], [-1, 2, 4], [1, -3, -4], [-2, 3, 4]]
+
+def _copy_sources(root: str):
+    package = os.path.dirname(os.path.dirname(os.path.abspath(cache.__file__)))
+    for directory in cache._SOURCE_PACKAGES:
+        shutil.copytree(os.path.join(package, directory), os.path.join(root, directory))
+    os.makedirs(os.path.join(root, "utils"))
+    for module in cache._SOURCE_MODULES:
+        shutil.copy(os.path.join(package, module), os.path.join(root, module))
+
+def test_version_follows_colorer_source(tmp_path, monkeypatch):
+    _copy_sources(str(tmp_path))
+    monkeypatch.setattr(cache, "__file__", str(tmp_path / "compiler" / "cache.py"))
+    monkeypatch.setattr(cache, "_compiler_version", None)
+    version = cache.compiler_version()
+    with open(tmp_path / "utils" / "sat_utils.py", "a") as f:
+        f.write("\n# changed colorer\n")
+    monkeypatch.setattr(cache, "_compiler_version", None)
+    assert cache.compiler_version() != version
+
+def _coloring_key(compiler: Max3satQaoaCompiler) -> str:
+    return cache.cache_key("coloring", formula=cache.formula_key(compiler.formula), coloring=compiler.coloring,
+                           coloring_time_budget=float(compiler.coloring_time_budget), coloring_seed=int(compiler.coloring_seed))
+
+def test_entries_miss_after_version_change(tmp_path, monkeypatch):
+    store = CompilationCache(str(tmp_path))
+    compiler = Max3satQaoaCompiler(CNF(from_clauses=FORMULA), FPQAConfig({}), cache=store)
+    compiler.compile()
+    assert len(store.entries()) == 2
+    assert store.get_coloring(_coloring_key(compiler)) is not None
+    monkeypatch.setattr(cache, "_compiler_version", "changed")
+    assert store.get_coloring(_coloring_key(compiler)) is None
+    assert Max3satQaoaCompiler(CNF(from_clauses=FORMULA), FPQAConfig({}), cache=store).compile() is not None
+    assert len(store.entries()) == 4
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from compiler.entrypoint import Max3satQaoaCompiler
+from nac.config import FPQAConfig
+from utils.experiments import FPQA_DATA_SCHEMA, RESULTS_FOLDER
+from utils.sat_utils import read_formula
+import pandas as pd
+
+SUITES = ("./benchmarks/", "./instances/")
+CCZ_FIDELITIES = [0.9775, 0.98, 0.9825, 0.985, 0.9875, 0.99, 0.9925, 0.995, 0.9975]
+
+class TaskTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise TaskTimeout()
+
+def run_with_timeout(function, timeout: float | None, *args):
+    # SIGALRM based, tasks run in the main thread of their worker process
+    if timeout is None:
+        return function(*args)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return function(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def task_name(filename: str) -> str:
+    # the suites share file names, the rows are keyed by the path
+    return os.path.relpath(filename).replace(os.sep, "/")
+
+def find_tasks(suites: list[str], pattern: str = "*.cnf") -> list[str]:
+    filenames = sorted(filename for suite in suites for filename in glob.glob(os.path.join(suite, pattern)))
+    # the largest formulas first, so that they do not end up as the stragglers of the pool
+    return sorted(filenames, key=os.path.getsize, reverse=True)
+
+def compile_rows(filename: str, ccz_fidelities: list[float], coloring: str = "dsatur", cache: str | None = None) -> list[list]:
+    # the rows of results/fpqa-1.csv, one per CCZ fidelity of the same single layer program
+    formula = read_formula(filename)
+    config = FPQAConfig({})
+    compiler = Max3satQaoaCompiler(formula, config, coloring=coloring, cache=cache)
+    start_time = time.time()
+    program = compiler.compile_single_layer()
+    execution_time = program.duration()
+    gates = program.count_ops()
+    compilation_time = time.time() - start_time
+    # the coloring compile() used, only looked up again when the program came from the cache
+    num_colors, _ = compiler.color_map()
+    rows = []
+    for ccz_fidelity in ccz_fidelities:
+        config.CCZ_GATE_FIDELITY = ccz_fidelity
+        rows.append([
+            task_name(filename),
+            formula.nv,
+            len(formula.clauses),
+            num_colors,
+            compilation_time,
+            execution_time,
+            program.avg_fidelity(),
+            gates["u3"],
+            gates["cz"],
+            gates["ccz"],
+            ccz_fidelity,
+            config.to_string()
+        ])
+    return rows
+
+def _run_task(filename: str, timeout: float | None, ccz_fidelities: list[float], coloring: str, cache: str | None) -> list[list]:
+    return run_with_timeout(compile_rows, timeout, filename, ccz_fidelities, coloring, cache)
+
+def completed_tasks(output: str) -> tuple[set[str], int]:
+    # names and number of rows already in the output, which makes a rerun resume
+    if not os.path.exists(output) or os.path.getsize(output) == 0:
+        return set(), 0
+    df = pd.read_csv(output, index_col=0)
+    return set(df["name"]), len(df)
+
+def append_rows(output: str, rows: list[list], start_index: int):
+    df = pd.DataFrame(rows, columns=FPQA_DATA_SCHEMA, index=range(start_index, start_index + len(rows)))
+    write_header = not os.path.exists(output) or os.path.getsize(output) == 0
+    df.to_csv(output, mode="a", header=write_header)
+
+def run_batch(filenames: list[str], output: str, workers: int | None = None, timeout: float | None = None,
+              ccz_fidelities: list[float] = CCZ_FIDELITIES, coloring: str = "dsatur", cache: str | None = None) -> list[tuple[str, str]]:
+    # rows are appended as soon as a task finishes, tasks already in the output are skipped,
+    # returns the (name, reason) of the failed ones, which a rerun retries
+    done, num_rows = completed_tasks(output)
+    pending = [filename for filename in filenames if task_name(filename) not in done]
+    failures = []
+    print(f">>> {len(done)} tasks done, {len(pending)} to run ...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_task, filename, timeout, ccz_fidelities, coloring, cache): filename for filename in pending}
+        for index, future in enumerate(as_completed(futures)):
+            name = task_name(futures[future])
+            try:
+                rows = future.result()
+            except TaskTimeout:
+                failures.append((name, f"timed out after {timeout} seconds"))
+            except Exception as e:
+                failures.append((name, f"{type(e).__name__}: {e}"))
+            else:
+                append_rows(output, rows, num_rows)
+                num_rows += len(rows)
+                print(f">>> Compiled {name} ({index + 1}/{len(pending)}) ...")
+                continue
+            print(f">>> Failed {name} ({index + 1}/{len(pending)}): {failures[-1][1]}", file=sys.stderr)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and evaluate CNF suites with the FPQA compiler on a process pool.")
+    parser.add_argument("suites", nargs="*", default=list(SUITES))
+    parser.add_argument("--pattern", default="*.cnf")
+    parser.add_argument("--output", default=os.path.join(RESULTS_FOLDER, "fpqa-batch.csv"))
+    parser.add_argument("--parquet", default=None, help="Also write the results to this Parquet file.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds per CNF.")
+    parser.add_argument("--ccz-fidelities", type=float, nargs="+", default=CCZ_FIDELITIES)
+    parser.add_argument("--coloring", default="dsatur")
+    parser.add_argument("--cache", default=None, help="Compilation cache directory.")
+    args = parser.parse_args()
+    if args.parquet is not None:
+        # fail before the batch when no parquet engine is installed
+        pd.io.parquet.get_engine("auto")
+    failures = run_batch(find_tasks(args.suites, args.pattern), args.output, args.workers, args.timeout,
+                         args.ccz_fidelities, args.coloring, args.cache)
+    if args.parquet is not None:
+        pd.read_csv(args.output, index_col=0).to_parquet(args.parquet)
+    if len(failures) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import glob
+import os
+import time
+from pysat.formula import CNF
+from compiler.entrypoint import Max3satQaoaCompiler
+from compiler.cost_profile import CostProfile
+from nac.config import FPQAConfig
+from nac.fpqa import FPQA
+from nac.instructions.rydberg import Rydberg
+from nac.instructions.multi_shuttle import MultiShuttle
+from nac.instructions.parallel import Parallel
+from nac.instructions.trap_transfer import TrapTransfer
+from qiskit import transpile
+from utils.circuit_utils import calculate_expected_fidelity
+from utils.fake_backend import create_fake_heavy_hex_backend
+from utils.hamiltonians import Max3satHamiltonian
+from utils.qaoa import QAOA
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_FOLDER = "./benchmarks/"
+
+def _all_pairs_interacting_pairs(fpqa: FPQA) -> list[tuple[int, int]]:
+    # reference O(n^2) sweep the spatial index replaces
+    pairs = []
+    for i in range(len(fpqa.atoms)):
+        for j in range(i + 1, len(fpqa.atoms)):
+            atom1, atom2 = fpqa.atoms[i], fpqa.atoms[j]
+            if atom2.id < atom1.id:
+                atom1, atom2 = atom2, atom1
+            if fpqa.is_interacting(atom1, atom2):
+                pairs.append((atom1.id, atom2.id))
+    return pairs
+
+def _time(function, repetitions: int) -> tuple[float, object]:
+    start_time = time.perf_counter()
+    for _ in range(repetitions):
+        result = function()
+    return (time.perf_counter() - start_time) / repetitions, result
+
+def benchmark_rydberg_interactions(pattern: str = "uuf200-*.cnf", repetitions: int = 10) -> pd.DataFrame:
+    data = []
+    for filename in sorted(glob.glob(os.path.join(BENCHMARKS_FOLDER, pattern))):
+        formula = CNF(from_file=filename)
+        start_time = time.perf_counter()
+        program = Max3satQaoaCompiler(formula, FPQAConfig({})).compile_single_layer()
+        compilation_time = time.perf_counter() - start_time
+        fpqa = program.fpqa
+        num_pulses = sum(1 for instruction in program.instructions if isinstance(instruction, Rydberg))
+        all_pairs_time, expected = _time(lambda: _all_pairs_interacting_pairs(fpqa), repetitions)
+        grid_time, grid_pairs = _time(lambda: fpqa.interacting_pairs("grid"), repetitions)
+        numpy_time, numpy_pairs = _time(lambda: fpqa.interacting_pairs("numpy"), repetitions)
+        if grid_pairs != expected or numpy_pairs != expected:
+            raise ValueError(f"Interaction engines disagree on {filename}")
+        data.append([
+            os.path.basename(filename),
+            len(fpqa.atoms),
+            num_pulses,
+            compilation_time,
+            all_pairs_time * 1e3,
+            grid_time * 1e3,
+            numpy_time * 1e3,
+            all_pairs_time / grid_time,
+            all_pairs_time / numpy_time
+        ])
+    columns = [
+        "name",
+        "num_atoms",
+        "rydberg_pulses",
+        "compilation_time (seconds)",
+        "all_pairs (ms/pulse)",
+        "grid (ms/pulse)",
+        "numpy (ms/pulse)",
+        "grid_speedup",
+        "numpy_speedup"
+    ]
+    return pd.DataFrame(data, columns=columns)
+
+def benchmark_qaoa_depth(pattern: str = "uf20-01.cnf", max_depth: int = 3, optimization_level: int = 1,
+                         backend_cache: str | None = None) -> pd.DataFrame:
+    data = []
+    backend = create_fake_heavy_hex_backend(7, 6, cache=backend_cache)
+    for filename in sorted(glob.glob(os.path.join(BENCHMARKS_FOLDER, pattern))):
+        formula = CNF(from_file=filename)
+        qaoa = QAOA(Max3satHamiltonian(formula=formula))
+        for p in range(1, max_depth + 1):
+            start_time = time.perf_counter()
+            program = Max3satQaoaCompiler(formula, FPQAConfig({})).compile(p)
+            compilation_time = time.perf_counter() - start_time
+            ops = program.count_ops()
+            circuit, cost_params, mixer_params = qaoa.naive_qaoa_circuit(p)
+            circuit = circuit.assign_parameters({cost_params: [0.2512 * np.pi] * p, mixer_params: [0.1235 * np.pi] * p})
+            circuit.measure_all()
+            start_time = time.perf_counter()
+            transpiled_circuit = transpile(circuit, backend=backend, optimization_level=optimization_level, seed_transpiler=0)
+            transpilation_time = time.perf_counter() - start_time
+            fidelity, _, _, _ = calculate_expected_fidelity(transpiled_circuit, backend)
+            data.append([
+                os.path.basename(filename),
+                p,
+                compilation_time,
+                program.duration(),
+                program.avg_fidelity(),
+                ops["cz"] + ops["ccz"],
+                transpilation_time,
+                transpiled_circuit.depth(),
+                sum(count for name, count in transpiled_circuit.count_ops().items() if name in ("ecr", "cx", "cz")),
+                fidelity
+            ])
+    columns = [
+        "name",
+        "p",
+        "fpqa_compilation_time (seconds)",
+        "fpqa_duration",
+        "fpqa_fidelity",
+        "fpqa_rydberg_gates",
+        "naive_transpilation_time (seconds)",
+        "naive_depth",
+        "naive_two_qubit_gates",
+        "naive_fidelity"
+    ]
+    return pd.DataFrame(data, columns=columns)
+
+def benchmark_config_grid(pattern: str = "uuf175-02.cnf", key: str = "CCZ_GATE_FIDELITY", start: float = 0.9775,
+                          stop: float = 0.985, num: int = 16) -> pd.DataFrame:
+    data = []
+    values = np.linspace(start, stop, num)
+    for filename in sorted(glob.glob(os.path.join(BENCHMARKS_FOLDER, pattern))):
+        formula = CNF(from_file=filename)
+        program = Max3satQaoaCompiler(formula, FPQAConfig({})).compile_single_layer()
+        config = program.fpqa.config
+        original = getattr(config, key)
+        start_time = time.perf_counter()
+        expected = []
+        for value in values:
+            setattr(config, key, value)
+            expected.append((program.duration(), program.avg_fidelity()))
+        loop_time = time.perf_counter() - start_time
+        setattr(config, key, original)
+        start_time = time.perf_counter()
+        profile = CostProfile(program)
+        profile_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        metrics = profile.evaluate(**{key: values})
+        evaluation_time = time.perf_counter() - start_time
+        if list(zip(metrics["duration"].tolist(), metrics["avg_fidelity"].tolist())) != expected:
+            raise ValueError(f"Cost profile disagrees with the program on {filename}")
+        data.append([
+            os.path.basename(filename),
+            len(program.instructions),
+            num,
+            loop_time * 1e3,
+            profile_time * 1e3,
+            evaluation_time * 1e3,
+            loop_time / evaluation_time
+        ])
+    columns = [
+        "name",
+        "instructions",
+        "configs",
+        "program_loop (ms)",
+        "profile (ms)",
+        "profile_evaluation (ms)",
+        "evaluation_speedup"
+    ]
+    return pd.DataFrame(data, columns=columns)
+
+def _count_leaves(instruction, instruction_type: type) -> int:
+    if type(instruction) is Parallel:
+        return sum(_count_leaves(child, instruction_type) for child in instruction.instructions)
+    return int(type(instruction) is instruction_type)
+
+def _shuttling_metrics(formula: CNF, shuttling: str) -> list:
+    compiler = Max3satQaoaCompiler(formula, FPQAConfig({}), shuttling=shuttling)
+    start_time = time.perf_counter()
+    program = compiler.compile_single_layer()
+    compilation_time = time.perf_counter() - start_time
+    num_colors, _ = compiler.color_map()
+    # every color takes one multi column shuttle per round, plus two to realign the columns
+    multi_shuttles = sum(_count_leaves(instruction, MultiShuttle) for instruction in program.instructions)
+    transfers = sum(_count_leaves(instruction, TrapTransfer) for instruction in program.instructions)
+    return [multi_shuttles - 2 * num_colors, transfers, program.duration(), compilation_time]
+
+def benchmark_shuttling(pattern: str = "uuf100-*.cnf") -> pd.DataFrame:
+    data = []
+    for filename in sorted(glob.glob(os.path.join(BENCHMARKS_FOLDER, pattern))):
+        formula = CNF(from_file=filename)
+        num_colors, _ = Max3satQaoaCompiler(formula, FPQAConfig({})).color_map()
+        greedy = _shuttling_metrics(formula, "greedy")
+        chains = _shuttling_metrics(formula, "chains")
+        data.append([os.path.basename(filename), num_colors] + [value for pair in zip(greedy, chains) for value in pair])
+    columns = [
+        "name",
+        "colors",
+        "greedy_rounds",
+        "chains_rounds",
+        "greedy_transfers",
+        "chains_transfers",
+        "greedy_duration",
+        "chains_duration",
+        "greedy_compilation_time (seconds)",
+        "chains_compilation_time (seconds)"
+    ]
+    return pd.DataFrame(data, columns=columns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks of the FPQA compiler.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    rydberg = subparsers.add_parser("rydberg", help="Rydberg interaction engine against the all-pairs sweep.")
+    rydberg.add_argument("--pattern", default="uuf200-*.cnf")
+    rydberg.add_argument("--repetitions", type=int, default=10)
+    depth = subparsers.add_parser("depth", help="Multi-layer FPQA compilation against the transpiled naive QAOA circuit.")
+    depth.add_argument("--pattern", default="uf20-01.cnf")
+    depth.add_argument("--max-depth", type=int, default=3)
+    depth.add_argument("--optimization-level", type=int, default=1)
+    depth.add_argument("--backend-cache", default=None, help="Fake backend cache directory.")
+    grid = subparsers.add_parser("config-grid", help="Cost profile evaluation of a config grid against re-evaluating the program.")
+    grid.add_argument("--pattern", default="uuf175-02.cnf")
+    grid.add_argument("--key", default="CCZ_GATE_FIDELITY")
+    grid.add_argument("--start", type=float, default=0.9775)
+    grid.add_argument("--stop", type=float, default=0.985)
+    grid.add_argument("--num", type=int, default=16)
+    shuttling = subparsers.add_parser("shuttling", help="Greedy shuttling rounds against the fewest rounds per color.")
+    shuttling.add_argument("--pattern", default="uuf100-*.cnf")
+    args = parser.parse_args()
+    if args.benchmark == "rydberg":
+        df = benchmark_rydberg_interactions(args.pattern, args.repetitions)
+    elif args.benchmark == "depth":
+        df = benchmark_qaoa_depth(args.pattern, args.max_depth, args.optimization_level, args.backend_cache)
+    elif args.benchmark == "config-grid":
+        df = benchmark_config_grid(args.pattern, args.key, args.start, args.stop, args.num)
+    elif args.benchmark == "shuttling":
+        df = benchmark_shuttling(args.pattern)
+    print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from qiskit.circuit import Gate
 from qiskit.converters import circuit_to_dag
 import numpy as np
 
@@ -51,4 +52,99 @@ def calculate_expected_fidelity_ideal(circuit, two_qubit_gate_fidelity=0.995, si
 def calculate_swap_overhead(actual_circuit, transpiled_circuit):
     actual_ops = actual_circuit.count_ops()
     transpiled_ops = transpiled_circuit.count_ops()
-    return int((transpiled_ops["ecr"] - actual_ops["cx"]) / 3)
\ No newline at end of file
+    return int((transpiled_ops["ecr"] - actual_ops["cx"]) / 3)
+TWO_QUBIT_GATES = ("ecr", "cx", "cz")
+
+class BackendErrorTable:
+    # errors and durations of the backend's target as arrays, per instruction and qubit and,
+    # for the two qubit gates, per coupled pair, read once per backend
+    def __init__(self, backend):
+        target = backend.target
+        self.num_qubits = backend.num_qubits
+        self.names = {name: i for i, name in enumerate(target.operation_names)}
+        self.errors = np.full((len(self.names), self.num_qubits), np.nan)
+        self.durations = np.full((len(self.names), self.num_qubits), np.nan)
+        # two qubit gates keyed by (instruction * num_qubits + first) * num_qubits + second, sorted
+        pairs = []
+        for name, i in self.names.items():
+            for qargs, properties in target[name].items():
+                if qargs is None or properties is None:
+                    continue
+                error = np.nan if properties.error is None else properties.error
+                duration = np.nan if properties.duration is None else properties.duration
+                if name in TWO_QUBIT_GATES and len(qargs) == 2:
+                    pairs.append(((i * self.num_qubits + qargs[0]) * self.num_qubits + qargs[1], error, duration))
+                elif len(qargs) == 1:
+                    self.errors[i, qargs[0]], self.durations[i, qargs[0]] = error, duration
+        pairs.sort()
+        self.pair_keys = np.array([key for key, _, _ in pairs], dtype=np.int64)
+        self.pair_errors = np.array([error for _, error, _ in pairs], dtype=float)
+        self.pair_durations = np.array([duration for _, _, duration in pairs], dtype=float)
+        self.t1 = np.array([backend.qubit_properties(q).t1 for q in range(self.num_qubits)], dtype=float)
+        self.t2 = np.array([backend.qubit_properties(q).t2 for q in range(self.num_qubits)], dtype=float)
+
+    def _instructions(self, circuit) -> tuple[np.ndarray, ...]:
+        # one pass over the circuit: name, first and second qubit and whether it is a gate per
+        # instruction, and the (instruction, wire) pairs, the clbit wires follow the qubit wires
+        qubit_index = {qubit: i for i, qubit in enumerate(circuit.qubits)}
+        clbit_index = {clbit: len(qubit_index) + i for i, clbit in enumerate(circuit.clbits)}
+        names, first, second, is_gate, wire_instructions, wires = [], [], [], [], [], []
+        for instruction in circuit.data:
+            # the name and the standard gate check do not build the operation object
+            name = instruction.name
+            if name == "barrier":
+                continue
+            if name not in self.names:
+                raise ValueError(f"Instruction {name} is not supported by the backend.")
+            qubits = [qubit_index[qubit] for qubit in instruction.qubits]
+            index = len(names)
+            names.append(self.names[name])
+            first.append(qubits[0])
+            second.append(qubits[1] if name in TWO_QUBIT_GATES else -1)
+            is_gate.append(instruction.is_standard_gate() or isinstance(instruction.operation, Gate))
+            for wire in qubits + [clbit_index[clbit] for clbit in instruction.clbits]:
+                wire_instructions.append(index)
+                wires.append(wire)
+        return (np.array(names, dtype=np.int64), np.array(first, dtype=np.int64), np.array(second, dtype=np.int64),
+                np.array(is_gate, dtype=bool), np.array(wire_instructions, dtype=np.int64), np.array(wires, dtype=np.int64))
+
+    def _lookup(self, names: np.ndarray, first: np.ndarray, second: np.ndarray, single: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+        values = np.full(len(names), np.nan)
+        is_pair = second >= 0
+        values[~is_pair] = single[names[~is_pair], first[~is_pair]]
+        if len(self.pair_keys) > 0:
+            keys = (names[is_pair] * self.num_qubits + first[is_pair]) * self.num_qubits + second[is_pair]
+            indices = np.minimum(np.searchsorted(self.pair_keys, keys), len(self.pair_keys) - 1)
+            values[is_pair] = np.where(self.pair_keys[indices] == keys, pairs[indices], np.nan)
+        if np.isnan(values).any():
+            raise ValueError("The backend has no error or duration for an instruction of the circuit.")
+        return values
+
+    def score(self, circuit, actual_circuit=None, two_qubit_gate_fidelity=0.995, single_qubit_gate_fidelity=0.999) -> dict:
+        # calculate_expected_fidelity, calculate_expected_fidelity_ideal and, given the circuit
+        # before transpilation, calculate_swap_overhead in one pass with the same rounding
+        names, first, second, is_gate, wire_instructions, wires = self._instructions(circuit)
+        errors = self._lookup(names[is_gate], first[is_gate], second[is_gate], self.errors, self.pair_errors)
+        durations = self._lookup(names, first, second, self.durations, self.pair_durations)
+        # products and sums are accumulated in circuit order, like the DAG walks
+        fidelity = np.multiply.accumulate(1 - errors)[-1] if len(errors) > 0 else 1
+        wire_durations = np.bincount(wires, weights=durations[wire_instructions], minlength=circuit.num_qubits + circuit.num_clbits)
+        decoherence_fidelity = 1
+        for wire, duration in enumerate(wire_durations.tolist()):
+            if duration > 0:
+                # a clbit wire takes the properties of the qubit with the clbit's index
+                qubit = wire if wire < circuit.num_qubits else wire - circuit.num_qubits
+                decoherence_fidelity *= np.exp(-duration / self.t1[qubit]) * np.exp(-duration / self.t2[qubit])
+        ideal_fidelities = np.where(second[is_gate] >= 0, two_qubit_gate_fidelity, single_qubit_gate_fidelity)
+        ideal_fidelity = np.multiply.accumulate(ideal_fidelities)[-1] if len(ideal_fidelities) > 0 else 1
+        scores = {
+            "fidelity": fidelity * decoherence_fidelity,
+            "fidelity_without_decoherence": fidelity,
+            "estimated_shots": np.log(1 - DESIRED_SUCCESS_PROBABILITY) / np.log(1 - fidelity * decoherence_fidelity),
+            "estimated_shots_without_decoherence": np.log(1 - DESIRED_SUCCESS_PROBABILITY) / np.log(1 - fidelity),
+            "ideal_fidelity": ideal_fidelity,
+            "ideal_estimated_shots": np.log(1 - DESIRED_SUCCESS_PROBABILITY) / np.log(1 - ideal_fidelity)
+        }
+        if actual_circuit is not None:
+            scores["swap_overhead"] = calculate_swap_overhead(actual_circuit, circuit)
+        return scores
@@ -1,6 +1,11 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from qiskit import transpile
+from qiskit.circuit import QuantumCircuit, ParameterVector
 from qiskit.providers import BackendV2
-from utils.circuit_utils import calculate_expected_fidelity, calculate_expected_fidelity_ideal, calculate_swap_overhead
+from qiskit.transpiler import PassManager
+from qiskit.transpiler.passes import Collect2qBlocks, ConsolidateBlocks, UnitarySynthesis, Optimize1qGatesDecomposition, CommutativeCancellation
+from utils.circuit_utils import BackendErrorTable
 from utils.qaoa import QAOA
 from utils.hamiltonians import Max3satHamiltonian
 import numpy as np
@@ -25,54 +30,176 @@ SUPERCONDUCTING_DATA_SCHEMA = [
     "Iterations"
 ]
 
+FPQA_DATA_SCHEMA = [
+    "name",
+    "num_variables",
+    "num_clauses",
+    "num_colors",
+    "compilation_time (seconds)",
+    "execution_time (microseconds)",
+    "eps (fidelity)",
+    "#u3",
+    "#cz",
+    "#ccz",
+    "ccz_fidelity",
+    "fpqa_config"
+]
+
+_worker_backend = None
+_worker_table = None
+_worker_rebind_passes = None
+_worker_circuits = {}
+
+def _init_worker(backend: BackendV2, circuits: dict):
+    # the backend and the parametrized circuits are shipped once per worker process
+    global _worker_backend, _worker_table, _worker_rebind_passes, _worker_circuits
+    _worker_backend, _worker_table, _worker_circuits = backend, BackendErrorTable(backend), circuits
+    _worker_rebind_passes = rebind_pass_manager(backend)
+
+def score_circuit(circuit: QuantumCircuit, transpiled_circuit: QuantumCircuit, table: BackendErrorTable) -> list[float]:
+    # depth, ideal fidelity and shots, fidelity and shots with and without decoherence,
+    # swap overhead and two qubit gates of a transpiled circuit
+    scores = table.score(transpiled_circuit, circuit)
+    return [transpiled_circuit.depth(), scores["ideal_fidelity"], scores["ideal_estimated_shots"], scores["fidelity"],
+            scores["estimated_shots"], scores["fidelity_without_decoherence"], scores["estimated_shots_without_decoherence"],
+            scores["swap_overhead"], transpiled_circuit.count_ops()["ecr"]]
+
+def transpile_iteration(circuit: QuantumCircuit, cost_params: ParameterVector, mixer_params: ParameterVector,
+                        values: tuple[np.ndarray, np.ndarray], backend: BackendV2, table: BackendErrorTable,
+                        seed_transpiler: int | None = None) -> list[float]:
+    bound_circuit = circuit.assign_parameters({cost_params: values[0], mixer_params: values[1]})
+    bound_circuit.measure_all()
+    transpiled_circuit = transpile(bound_circuit, backend=backend, optimization_level=3, seed_transpiler=seed_transpiler)
+    return score_circuit(bound_circuit, transpiled_circuit, table)
+
+def route_circuit(circuit: QuantumCircuit, backend: BackendV2, seed_transpiler: int | None = None) -> QuantumCircuit:
+    # the parametrized circuit is transpiled once and bound afterwards, the optimizer cannot
+    # fold angles it does not know and the routing it picks is usually worse than the one
+    # found for a bound circuit, rebind_pass_manager recovers part of the difference
+    measured_circuit = circuit.measure_all(inplace=False)
+    return transpile(measured_circuit, backend=backend, optimization_level=3, seed_transpiler=seed_transpiler)
+
+def rebind_pass_manager(backend: BackendV2) -> PassManager:
+    # the optimizations of level 3 that need the angles, run on a bound routed circuit
+    # without touching its layout or routing
+    return PassManager([
+        Collect2qBlocks(),
+        ConsolidateBlocks(target=backend.target),
+        UnitarySynthesis(target=backend.target),
+        Optimize1qGatesDecomposition(target=backend.target),
+        CommutativeCancellation(target=backend.target),
+        Optimize1qGatesDecomposition(target=backend.target)
+    ])
+
+def rebind_iterations(circuit: QuantumCircuit, cost_params: ParameterVector, mixer_params: ParameterVector,
+                      values: list[tuple[np.ndarray, np.ndarray]], table: BackendErrorTable, routed_circuit: QuantumCircuit,
+                      passes: PassManager) -> list[list[float]]:
+    measured_circuit = circuit.measure_all(inplace=False)
+    results = []
+    for cost_values, mixer_values in values:
+        # parameters the transpiler optimized away are skipped
+        bound_circuit = routed_circuit.assign_parameters({cost_params: cost_values, mixer_params: mixer_values}, strict=False)
+        results.append(score_circuit(measured_circuit, passes.run(bound_circuit), table))
+    return results
+
+def _transpile_task(key: tuple[int, int], values: tuple[np.ndarray, np.ndarray], seed_transpiler: int | None) -> list[float]:
+    return transpile_iteration(*_worker_circuits[key], values, _worker_backend, _worker_table, seed_transpiler)
+
+def _route_task(key: tuple[int, int], values: list[tuple[np.ndarray, np.ndarray]], seed_transpiler: int | None) -> tuple[QuantumCircuit, list[list[float]]]:
+    routed_circuit = route_circuit(_worker_circuits[key][0], _worker_backend, seed_transpiler)
+    return routed_circuit, rebind_iterations(*_worker_circuits[key], values, _worker_table, routed_circuit, _worker_rebind_passes)
+
 class SuperconductingExperiment:
     def __init__(self, experiment_name, problem_names: list[str], backend: BackendV2):
         self.experiment_name = experiment_name
         self.problem_names = problem_names
         self.backend = backend
-        
-    def run(self, max_depth=1, max_iterations=10) -> pd.DataFrame:
-        data = []
-        for problem_name in self.problem_names:
-            hamiltonian = Max3satHamiltonian(INSTANCES_FOLDER + problem_name)
-            qaoa = QAOA(hamiltonian)
-            print(f">>> Starting experiments with Problem: {problem_name} ...")
+        self.error_table = BackendErrorTable(backend)
+        self.rebind_passes = rebind_pass_manager(backend)
+        # (problem name, depth, transpiler seed) -> transpiled parametrized circuit
+        self.routed_circuits = {}
+
+    def _tasks(self, max_depth: int, max_iterations: int, seed: int | None) -> tuple[dict, list]:
+        # the angles of every iteration are drawn up front, with a seed from a stream per problem and depth
+        circuits, tasks = {}, []
+        for problem_index, problem_name in enumerate(self.problem_names):
+            qaoa = QAOA(Max3satHamiltonian(INSTANCES_FOLDER + problem_name))
             for p in range(1, max_depth + 1):
-                qaoa_circuit, cost_params, mixer_params = qaoa.naive_qaoa_circuit(p)
-                fidelity, estimated_shots = 0.0, 0
-                fidelity_with_decoherence, estimated_shots_with_decoherence = 0.0, 0
-                ideal_fidelity, ideal_estimated_shots = 0.0, 0
-                circuit_depth, num_two_qubit_gates, swap_overhead = 0, 0, 0
-                print(f">>> Parametrized circuit created, Depth: {p} ...")
-                for i in range(max_iterations):
-                    print(f">>> Transpiling parametrized circuit, Iteration: {i} ...") 
-                    params = {
-                        cost_params: np.random.uniform(low=0.0, high=2*np.pi, size=len(cost_params)),
-                        mixer_params: np.random.uniform(low=0, high=np.pi, size=len(mixer_params))
-                    }
-                    bound_circuit = qaoa_circuit.assign_parameters(params)
-                    bound_circuit.measure_all()
-                    transpiled_circuit = transpile(bound_circuit, backend=self.backend, optimization_level=3)
-                    fwd, f, eswd, es = calculate_expected_fidelity(transpiled_circuit, self.backend)
-                    ideal_f, ideal_es = calculate_expected_fidelity_ideal(transpiled_circuit)
-                    fidelity_with_decoherence += fwd
-                    fidelity += f
-                    estimated_shots_with_decoherence += eswd
-                    estimated_shots += es
-                    num_two_qubit_gates += transpiled_circuit.count_ops()["ecr"]
-                    swap_overhead += calculate_swap_overhead(bound_circuit, transpiled_circuit)
-                    ideal_fidelity += ideal_f
-                    ideal_estimated_shots += ideal_es
-                    circuit_depth += transpiled_circuit.depth()
-                avg_results = np.array([circuit_depth, ideal_fidelity, ideal_estimated_shots, 
-                                        fidelity_with_decoherence, estimated_shots_with_decoherence, 
-                                        fidelity, estimated_shots, 
-                                        swap_overhead, num_two_qubit_gates], 
-                                       dtype=float) / max_iterations
-                avg_results = avg_results.tolist()
-                avg_results[-2] = int(np.ceil(avg_results[-2]))
-                avg_results[-1] = int(np.ceil(avg_results[-1]))
-                data.append([problem_name, self.backend.name, p] + avg_results + [max_iterations])
+                circuits[(problem_index, p)] = qaoa.naive_qaoa_circuit(p)
+                _, cost_params, mixer_params = circuits[(problem_index, p)]
+                rng = np.random if seed is None else np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(problem_index, p)))
+                for _ in range(max_iterations):
+                    values = (rng.uniform(low=0.0, high=2*np.pi, size=len(cost_params)),
+                              rng.uniform(low=0, high=np.pi, size=len(mixer_params)))
+                    seed_transpiler = None if seed is None else int(rng.integers(2**31))
+                    tasks.append(((problem_index, p), values, seed_transpiler))
+        return circuits, tasks
+
+    def _transpile_each(self, circuits: dict, tasks: list, max_iterations: int, workers: int | None) -> list[list[float]]:
+        if workers is None:
+            results = []
+            for key, values, seed_transpiler in tasks:
+                problem_index, p = key
+                print(f">>> Transpiling {self.problem_names[problem_index]}, Depth: {p}, Iteration: {len(results) % max_iterations} ...")
+                results.append(transpile_iteration(*circuits[key], values, self.backend, self.error_table, seed_transpiler))
+            return results
+        print(f">>> Transpiling {len(tasks)} circuits on {workers} workers ...")
+        with self._pool(circuits, workers) as executor:
+            return list(executor.map(_transpile_task, *zip(*tasks)))
+
+    def _transpile_once(self, circuits: dict, tasks: list, max_iterations: int, workers: int | None) -> list[list[float]]:
+        # one transpilation per problem, depth and transpiler seed (that of the first iteration),
+        # which is kept in routed_circuits for later runs
+        groups, routed_keys = [], []
+        for i in range(0, len(tasks), max_iterations):
+            key, _, seed_transpiler = tasks[i]
+            groups.append((key, [values for _, values, _ in tasks[i:i + max_iterations]], seed_transpiler))
+            routed_keys.append((self.problem_names[key[0]], key[1], seed_transpiler))
+        pending = [i for i, routed_key in enumerate(routed_keys) if routed_key not in self.routed_circuits]
+        results = [None] * len(groups)
+        if workers is None:
+            for i in pending:
+                key, _, seed_transpiler = groups[i]
+                print(f">>> Transpiling {routed_keys[i][0]}, Depth: {key[1]} once ...")
+                self.routed_circuits[routed_keys[i]] = route_circuit(circuits[key][0], self.backend, seed_transpiler)
+        elif len(pending) > 0:
+            print(f">>> Transpiling {len(pending)} circuits on {workers} workers ...")
+            with self._pool(circuits, workers) as executor:
+                for i, (routed_circuit, group_results) in zip(pending, executor.map(_route_task, *zip(*[groups[i] for i in pending]))):
+                    self.routed_circuits[routed_keys[i]] = routed_circuit
+                    results[i] = group_results
+        for i, (key, values, _) in enumerate(groups):
+            if results[i] is None:
+                results[i] = rebind_iterations(*circuits[key], values, self.error_table, self.routed_circuits[routed_keys[i]], self.rebind_passes)
+        return [result for group_results in results for result in group_results]
+
+    def _pool(self, circuits: dict, workers: int) -> ProcessPoolExecutor:
+        # forked workers can deadlock on the transpiler's native thread pool
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(self.backend, circuits))
+
+    def run(self, max_depth=1, max_iterations=10, workers: int | None = None, seed: int | None = None,
+            transpile_once: bool = False) -> pd.DataFrame:
+        # workers transpiles the iterations on a process pool, the averages do not depend on it,
+        # seed also fixes the transpiler's passes so that runs are reproducible, transpile_once
+        # routes every parametrized circuit once and only binds the angles per iteration
+        # transpile_once is much faster but its routing cannot adapt to the angles, even with
+        # the post binding passes the circuits come out deeper and with more swaps than
+        # transpiled per binding, which stays the default for reported results
+        circuits, tasks = self._tasks(max_depth, max_iterations, seed)
+        if transpile_once:
+            results = self._transpile_once(circuits, tasks, max_iterations, workers)
+        else:
+            results = self._transpile_each(circuits, tasks, max_iterations, workers)
+        data = []
+        for i in range(0, len(tasks), max_iterations):
+            problem_index, p = tasks[i][0]
+            # summed in iteration order, whichever worker finished first
+            avg_results = np.array([sum(column) for column in zip(*results[i:i + max_iterations])], dtype=float) / max_iterations
+            avg_results = avg_results.tolist()
+            avg_results[-2] = int(np.ceil(avg_results[-2]))
+            avg_results[-1] = int(np.ceil(avg_results[-1]))
+            data.append([self.problem_names[problem_index], self.backend.name, p] + avg_results + [max_iterations])
         df = pd.DataFrame(data, columns=SUPERCONDUCTING_DATA_SCHEMA)
         df.to_csv(RESULTS_FOLDER + self.experiment_name + ".csv", index=False)
-        return df
\ No newline at end of file
+        return df
@@ -1,9 +1,15 @@
 from qiskit.providers.fake_provider import GenericBackendV2
 from qiskit.exceptions import QiskitError
-from qiskit.transpiler import CouplingMap, Target, QubitProperties
+from qiskit.transpiler import CouplingMap, Target, QubitProperties, InstructionProperties
 from qiskit.pulse.instruction_schedule_map import InstructionScheduleMap
+from qiskit.circuit.library import get_standard_gate_name_mapping
 from qiskit.circuit.controlflow import IfElseOp, WhileLoopOp, ForLoopOp, SwitchCaseOp, BreakLoopOp, ContinueLoopOp
 from math import ceil, floor
+import hashlib
+import json
+import os
+import qiskit
+import numpy as np
 
 _NOISE_DEFAULTS = {
     "cx": (7.992e-08, 8.99988e-07, 1e-5, 5e-3),
@@ -36,8 +42,11 @@ class NoisyFakeBackend(GenericBackendV2):
         dtm: float | None = None,
         seed: int | None = None,
         noise_settings: dict,
+        target: Target | None = None,
     ):
         self._noise_settings = noise_settings
+        # a target built before, e.g. loaded from disk, replaces the generated one
+        self._prebuilt_target = target
         self.basis_gates = basis_gates
         super().__init__(num_qubits,
             basis_gates,
@@ -56,6 +65,79 @@ class NoisyFakeBackend(GenericBackendV2):
             return _NOISE_DEFAULTS_FALLBACK["1-q"]
         return _NOISE_DEFAULTS_FALLBACK["multi-q"]
 
+    def _build_generic_target(self):
+        if self._prebuilt_target is None:
+            super()._build_generic_target()
+        else:
+            self._target = self._prebuilt_target
+
+    def _build_default_channels(self):
+        # the deprecated pulse channels are built on first use, transpiling does not need them
+        self._channels_map = None
+
+    @property
+    def channels_map(self) -> dict:
+        if self._channels_map is None:
+            super()._build_default_channels()
+        return self._channels_map
+
+    @channels_map.setter
+    def channels_map(self, channels_map: dict):
+        self._channels_map = channels_map
+
+    def save(self, filename: str):
+        # coupling map, qubit properties and the (qargs, duration, error) of every instruction as arrays,
+        # the target is rebuilt from them without sampling or calibrating anything
+        target = self.target
+        arrays = {
+            "num_qubits": np.array(self.num_qubits),
+            "edges": np.array(self.coupling_map.get_edges(), dtype=np.int64).reshape(-1, 2),
+            "dt": np.array(target.dt),
+            "qubit_properties": np.array([[np.nan if value is None else value for value in (qubit.t1, qubit.t2, qubit.frequency)]
+                                          for qubit in target.qubit_properties], dtype=float).reshape(-1, 3),
+            "basis_gates": np.array(self._basis_gates),
+            "noise_settings": np.array(json.dumps(self._noise_settings))
+        }
+        # equal properties are stored once, indices of -1 mark qargs without properties
+        properties_index = {}
+        for name in self._basis_gates:
+            items = list(target[name].items())
+            if any(properties is not None and properties._calibration is not None for _, properties in items):
+                raise ValueError(f"Calibrated instructions can not be saved: {name}")
+            arrays[f"{name}_qargs"] = np.array([qargs for qargs, _ in items], dtype=np.int64).reshape(len(items), -1)
+            arrays[f"{name}_properties"] = np.array([-1 if properties is None else
+                                                     properties_index.setdefault((properties.duration, properties.error), len(properties_index))
+                                                     for _, properties in items], dtype=np.int64)
+        arrays["properties"] = np.array([[np.nan if value is None else value for value in key] for key in properties_index],
+                                        dtype=float).reshape(-1, 2)
+        with open(filename, "wb") as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def load(filename: str) -> "NoisyFakeBackend":
+        with np.load(filename) as arrays:
+            num_qubits = int(arrays["num_qubits"])
+            target = Target(
+                description=f"Generic Target with {num_qubits} qubits",
+                num_qubits=num_qubits,
+                dt=float(arrays["dt"]),
+                qubit_properties=[
+                    QubitProperties(t1=t1, t2=t2, frequency=frequency)
+                    for t1, t2, frequency in _nan_to_none(arrays["qubit_properties"])
+                ],
+                concurrent_measurements=[list(range(num_qubits))]
+            )
+            basis_gates = arrays["basis_gates"].tolist()
+            supported_gates = get_standard_gate_name_mapping()
+            # qargs with equal properties share them, constructing one per qarg dominates the load
+            properties = [InstructionProperties(duration, error) for duration, error in _nan_to_none(arrays["properties"])]
+            for name in basis_gates:
+                qargs = map(tuple, arrays[f"{name}_qargs"].tolist())
+                indices = arrays[f"{name}_properties"].tolist()
+                target.add_instruction(supported_gates[name], dict(zip(qargs, (None if i < 0 else properties[i] for i in indices))))
+            return NoisyFakeBackend(num_qubits, basis_gates=basis_gates, coupling_map=arrays["edges"].tolist(),
+                                    noise_settings=json.loads(str(arrays["noise_settings"])), target=target)
+
     def _build_generic_target_self(self):
         self._target = Target(
             description=f"Generic Target with {self._num_qubits} qubits",
@@ -95,15 +177,42 @@ class NoisyFakeBackend(GenericBackendV2):
             self._target.add_instruction(BreakLoopOp, name="break")
             self._target.add_instruction(ContinueLoopOp, name="continue")
 
+def _nan_to_none(values: np.ndarray) -> list[list[float | None]]:
+    return [[None if value != value else value for value in row] for row in values.tolist()]
+
 def _get_heavy_hex_row_qubit_id(row, column, num_qubits_row, num_qubits_between_rows):
     if row == 0:
         return column
     return (row - 1) * num_qubits_row + num_qubits_row - 2 + row * num_qubits_between_rows + column
     
-def _get_heavy_hex_bridge_qubit_id(row, column, num_qubits_row, num_qubits_between_rows):
-    offset = int(column / 4) if row % 2 == 0 else int((column - 2) / 4)
-    last_column = num_qubits_row - 3 if row == 0 else num_qubits_row - 1
-    return _get_heavy_hex_row_qubit_id(row, last_column, num_qubits_row, num_qubits_between_rows) + offset + 1
+def heavy_hex_coupling_map(rows: int, columns: int) -> np.ndarray:
+    # (edges, 2) array of the lattice create_fake_heavy_hex_backend builds, in the order of
+    # its former per qubit loop: rows of 4 * columns + 3 qubits, the first and the last one
+    # two qubits shorter, with columns + 1 bridge qubits between consecutive rows
+    num_qubits_row = 4 * columns + 3
+    num_qubits_between_rows = columns + 1
+    def row_qubit_id(row, column):
+        return np.where(row == 0, column, (row - 1) * num_qubits_row + num_qubits_row - 2 + row * num_qubits_between_rows + column)
+    r, c = np.meshgrid(np.arange(rows + 1), np.arange(num_qubits_row), indexing="ij")
+    num_qubits_current_row = np.where((r == 0) | (r == rows), num_qubits_row - 2, num_qubits_row)
+    qubit_id = row_qubit_id(r, c)
+    shifted = c - 2 * (r % 2)
+    is_bridged = (c < num_qubits_current_row) & (shifted % 4 == 0) & (r < rows)
+    last_column = np.where(r == 0, num_qubits_row - 3, num_qubits_row - 1)
+    bridge_qubit_id = row_qubit_id(r, last_column) + shifted // 4 + 1
+    next_qubit_id = row_qubit_id(r + 1, np.where(r < rows - 1, c, c - 2))
+    # per qubit the edge to its right neighbour, to its bridge and from the bridge to the next row
+    edges = np.stack([
+        np.stack([qubit_id, qubit_id + 1], axis=-1),
+        np.stack([qubit_id, bridge_qubit_id], axis=-1),
+        np.stack([bridge_qubit_id, next_qubit_id], axis=-1)
+    ], axis=2)
+    mask = np.stack([c + 1 < num_qubits_current_row, is_bridged, is_bridged], axis=2)
+    return edges[mask]
+
+def _backend_cache_key(rows: int, columns: int, noise_settings: dict, seed: int | None) -> str:
+    fields = {"rows": rows, "columns": columns, "noise_settings": noise_settings, "seed": seed, "qiskit": qiskit.__version__}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
 
 def create_fake_heavy_hex_backend(
     rows,
@@ -116,6 +225,8 @@ def create_fake_heavy_hex_backend(
     readout_error=0.001,
     t1=100,
     t2=1.5,
+    seed=None,
+    cache: str | None = None,
 ) -> NoisyFakeBackend:
     noise_settings = {
         "ecr": (two_qubit_gate_duration, two_qubit_gate_error),
@@ -131,24 +242,24 @@ def create_fake_heavy_hex_backend(
         "t1": t1,
         "t2": t2
     }
+    # a cached backend keeps the qubit properties sampled when it was first built
+    if cache is not None:
+        path = os.path.join(cache, f"{_backend_cache_key(rows, columns, noise_settings, seed)}.npz")
+        if os.path.exists(path):
+            return NoisyFakeBackend.load(path)
     basis_gates=["id", "rz", "sx", "x", "u3", "cz", "ecr", "reset", "delay", "measure"]
     num_qubits_row = 4 * columns + 3
     num_qubits_between_rows = columns + 1
     num_qubits = _get_heavy_hex_row_qubit_id(rows, num_qubits_row - 3, num_qubits_row, num_qubits_between_rows) + 1
-    coupling_map = []
-    for r in range(rows + 1):
-        num_qubits_current_row = num_qubits_row - 2 if r == 0 or r == rows else num_qubits_row
-        for c in range(num_qubits_current_row):
-            qubit_id = _get_heavy_hex_row_qubit_id(r, c, num_qubits_row, num_qubits_between_rows)
-            if c + 1 < num_qubits_current_row:
-                coupling_map.append([qubit_id, qubit_id + 1])
-            offset = 0
-            if r % 2 == 1:
-                offset = -2
-            if (c + offset) % 4 == 0 and r < rows:
-                bridge_qubit_id = _get_heavy_hex_bridge_qubit_id(r, c, num_qubits_row, num_qubits_between_rows)
-                next_c = c if r < rows - 1 else c - 2
-                next_qubit_id = _get_heavy_hex_row_qubit_id(r + 1, next_c, num_qubits_row, num_qubits_between_rows)
-                coupling_map.append([qubit_id, bridge_qubit_id])
-                coupling_map.append([bridge_qubit_id, next_qubit_id])
-    return NoisyFakeBackend(num_qubits, basis_gates=basis_gates, coupling_map=coupling_map, noise_settings=noise_settings)
\ No newline at end of file
+    coupling_map = heavy_hex_coupling_map(rows, columns).tolist()
+    backend = NoisyFakeBackend(num_qubits, basis_gates=basis_gates, coupling_map=coupling_map, seed=seed, noise_settings=noise_settings)
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            backend.save(temporary)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    return backend
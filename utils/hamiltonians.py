@@ -1,4 +1,5 @@
-from qiskit.quantum_info import SparsePauliOp
+from itertools import combinations
+from qiskit.quantum_info import SparsePauliOp, PauliList
 from pysat.formula import CNF
 import numpy as np
 
@@ -8,63 +9,74 @@ class Max3satHamiltonian:
             self.formula = formula
         else:
             self.formula = CNF(from_file=file)
-        self.single_map = {}
-        self.quadratic_map = {}
-        self.cubic_map = {}
+        self.terms = self._build_terms()
+        self.single_map = self._get_term_map(1, lambda indices: indices[0])
+        self.quadratic_map = self._get_term_map(2, tuple)
+        self.cubic_map = self._get_term_map(3, tuple)
+
+    def _build_terms(self) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+        # every clause contributes -prod(signs) to each subset of its (sorted) variables
+        clauses_by_length = {}
         for clause in self.formula.clauses:
-            variables = np.sort(np.abs(clause)) - 1
-            signs = np.sign([clause[i] for i in np.argsort(np.abs(clause))])
-            for i in range(len(variables)):
-                v_i = variables[i]
-                if v_i not in self.single_map:
-                    self.single_map[v_i] = 0
-                self.single_map[v_i] += -signs[i]
-                if self.single_map[v_i] == 0:
-                    self.single_map.pop(v_i)
-                for j in range(i + 1, len(variables)):
-                    v_j = variables[j]
-                    if (v_i, v_j) not in self.quadratic_map:
-                        self.quadratic_map[(v_i, v_j)] = 0
-                    self.quadratic_map[(v_i, v_j)] += -(signs[i] * signs[j])
-                    if self.quadratic_map[(v_i, v_j)] == 0:
-                        self.quadratic_map.pop((v_i, v_j))
-                    for k in range(j + 1, len(variables)):
-                        v_k = variables[k]
-                        if (v_i, v_j, v_k) not in self.cubic_map:
-                            self.cubic_map[(v_i, v_j, v_k)] = 0
-                        self.cubic_map[(v_i, v_j, v_k)] += -(signs[i] * signs[j] * signs[k])
-                        if self.cubic_map[(v_i, v_j, v_k)] == 0:
-                            self.cubic_map.pop((v_i, v_j, v_k))
+            if len(clause) > 0:
+                clauses_by_length.setdefault(len(clause), []).append(clause)
+        indices_by_order, coeffs_by_order = {}, {}
+        for length, clauses in clauses_by_length.items():
+            literals = np.array(clauses, dtype=np.int64)
+            order = np.argsort(np.abs(literals), axis=1, kind="stable")
+            literals = np.take_along_axis(literals, order, axis=1)
+            variables, signs = np.abs(literals) - 1, np.sign(literals)
+            for size in range(1, length + 1):
+                for subset in combinations(range(length), size):
+                    subset = list(subset)
+                    indices_by_order.setdefault(size, []).append(variables[:, subset])
+                    coeffs_by_order.setdefault(size, []).append(-np.prod(signs[:, subset], axis=1))
+        terms = {}
+        for size in sorted(indices_by_order):
+            indices, inverse = np.unique(np.concatenate(indices_by_order[size]), axis=0, return_inverse=True)
+            coeffs = np.zeros(len(indices), dtype=np.int64)
+            np.add.at(coeffs, inverse.reshape(-1), np.concatenate(coeffs_by_order[size]))
+            nonzero = coeffs != 0
+            terms[size] = (indices[nonzero], coeffs[nonzero])
+        return terms
+
+    def _get_term_map(self, size: int, key) -> dict:
+        if size not in self.terms:
+            return {}
+        indices, coeffs = self.terms[size]
+        return {key(term): coeff for term, coeff in zip(map(tuple, indices.tolist()), coeffs.tolist())}
 
     def __pauli_string(self, indices):
         pauli_string = ["I"] * self.formula.nv
         for i in indices:
             pauli_string[i] = "Z"
         return "".join(pauli_string)
-    
+
+    def get_terms(self) -> list[tuple[int, tuple[int, ...]]]:
+        terms = []
+        for indices, coeffs in self.terms.values():
+            # terms of clauses repeating a variable have no pauli string
+            distinct = np.all(indices[:, 1:] > indices[:, :-1], axis=1)
+            indices, coeffs = indices[distinct], coeffs[distinct]
+            terms.extend(zip(coeffs.tolist(), map(tuple, indices.tolist())))
+        terms.sort(key=lambda term: term[1])
+        return terms
+
     def get_pauli_list(self):
-        pauli_list = []
-        for i in range(self.formula.nv):
-            if i in self.single_map:
-                substring = self.__pauli_string([i])
-                pauli_list.append((self.single_map[i], substring, (i, )))
-            for j in range(i + 1, self.formula.nv):
-                if (i, j) in self.quadratic_map:
-                    substring = self.__pauli_string([i, j])
-                    pauli_list.append((self.quadratic_map[(i, j)], substring, (i, j)))
-                for k in range(j + 1, self.formula.nv):
-                    if (i, j, k) in self.cubic_map:
-                        substring = self.__pauli_string([i, j, k])
-                        pauli_list.append((self.cubic_map[(i,j,k)], substring, (i, j, k)))
-        return pauli_list
+        return [(coeff, self.__pauli_string(qubits), qubits) for coeff, qubits in self.get_terms()]
+
+    def get_sparse_list(self) -> list[tuple[str, list[int], int]]:
+        # position i of a dense pauli string is qubit nv - 1 - i in qiskit's little endian order
+        num_qubits = self.formula.nv
+        return [("Z" * len(qubits), [num_qubits - 1 - i for i in qubits], coeff) for coeff, qubits in self.get_terms()]
 
     def get_sparse_pauli_operator(self):
-        pauli_list = self.get_pauli_list()
-        data, coeffs = [], []
-        for coeff, pauli_str, qubits in pauli_list:
-            data.append(pauli_str)
-            coeffs.append(coeff)
-        return SparsePauliOp(data, coeffs=coeffs)
-    
-    
-                        
+        # symplectic form directly, from_sparse_list goes through one dense label per term
+        terms = self.get_terms()
+        num_qubits = self.formula.nv
+        z = np.zeros((len(terms), num_qubits), dtype=bool)
+        rows = [row for row, (_, qubits) in enumerate(terms) for _ in qubits]
+        cols = [num_qubits - 1 - i for _, qubits in terms for i in qubits]
+        z[rows, cols] = True
+        paulis = PauliList.from_symplectic(z, np.zeros_like(z))
+        return SparsePauliOp(paulis, coeffs=np.array([coeff for coeff, _ in terms], dtype=complex))
@@ -0,0 +1,190 @@
+from itertools import combinations
+from utils.hamiltonians import Max3satHamiltonian
+import numpy as np
+
+MIXERS = ("x", "y")
+MAX_STATEVECTOR_QUBITS = 28
+# elementwise passes over the statevector work in chunks to keep temporaries small
+_CHUNK_SIZE = 1 << 20
+
+def _fwht(vector: np.ndarray):
+    # in place walsh-hadamard transform along the last axis,
+    # entry x becomes sum_m vector[m] * (-1)^popcount(x & m)
+    for q in range(vector.shape[-1].bit_length() - 1):
+        view = vector.reshape(*vector.shape[:-1], -1, 2, 1 << q)
+        low = view[..., 0, :].copy()
+        view[..., 0, :] += view[..., 1, :]
+        view[..., 1, :] *= -1
+        view[..., 1, :] += low
+
+def _apply_mixer(state: np.ndarray, beta: float, mixer: str):
+    # exp(-i beta P) on every qubit, P = X or Y
+    c, s = np.cos(beta), np.sin(beta)
+    for q in range(state.size.bit_length() - 1):
+        view = state.reshape(-1, 2, 1 << q)
+        low = view[:, 0].copy()
+        if mixer == "x":
+            view[:, 0] *= c
+            view[:, 0] += -1j * s * view[:, 1]
+            view[:, 1] *= c
+            view[:, 1] += -1j * s * low
+        else:
+            view[:, 0] *= c
+            view[:, 0] -= s * view[:, 1]
+            view[:, 1] *= c
+            view[:, 1] += s * low
+
+class Max3satQaoaEvaluator:
+    # <H> of the Max3satHamiltonian after the QAOA circuit of utils/qaoa.py,
+    # H^n followed by exp(-i gamma H) exp(-i beta sum P) per layer, P = X (rx(2 beta)) or Y
+    def __init__(self, hamiltonian: Max3satHamiltonian, mixer: str = "x", dtype=np.complex128):
+        if mixer not in MIXERS:
+            raise ValueError(f"Unknown mixer: {mixer}")
+        self.hamiltonian = hamiltonian
+        self.num_qubits = hamiltonian.formula.nv
+        self.terms = hamiltonian.get_terms()
+        self.mixer = mixer
+        self.dtype = np.dtype(dtype)
+        self._cost_vector = None
+        self._lightcone_coeffs = None
+
+    def cost_vector(self) -> np.ndarray:
+        if self._cost_vector is None:
+            cost = np.zeros(1 << self.num_qubits, dtype=np.zeros(0, dtype=self.dtype).real.dtype)
+            for coeff, qubits in self.terms:
+                cost[sum(1 << i for i in qubits)] = coeff
+            _fwht(cost)
+            self._cost_vector = cost
+        return self._cost_vector
+
+    def statevector(self, gammas: list[float], betas: list[float]) -> np.ndarray:
+        if len(gammas) != len(betas):
+            raise ValueError("Number of cost and mixer parameters differ.")
+        cost = self.cost_vector()
+        state = np.full(cost.size, 1.0 / np.sqrt(cost.size), dtype=self.dtype)
+        for gamma, beta in zip(gammas, betas):
+            for start in range(0, cost.size, _CHUNK_SIZE):
+                state[start:start + _CHUNK_SIZE] *= np.exp(-1j * gamma * cost[start:start + _CHUNK_SIZE])
+            _apply_mixer(state, beta, self.mixer)
+        return state
+
+    def statevector_energy(self, gammas: list[float], betas: list[float]) -> float:
+        state = self.statevector(gammas, betas)
+        cost = self.cost_vector()
+        energy = 0.0
+        for start in range(0, cost.size, _CHUNK_SIZE):
+            chunk = state[start:start + _CHUNK_SIZE]
+            energy += float(np.dot(chunk.real ** 2 + chunk.imag ** 2, cost[start:start + _CHUNK_SIZE]))
+        return energy
+
+    def _term_factor(self, coeff: int, qubits: tuple[int, ...], phases: np.ndarray) -> np.ndarray:
+        signs = np.ones((2,) * len(qubits), dtype=np.int64)
+        for axis in range(len(qubits)):
+            signs = signs * np.array([1, -1]).reshape((2,) + (1,) * (len(qubits) - axis - 1))
+        return np.power.outer(phases, coeff * signs)
+
+    def _contract(self, factors: list[tuple[tuple[int, ...], np.ndarray]], num_samples: int) -> np.ndarray:
+        # average of the product of the factors over all variables, eliminating
+        # the variables one by one in min-degree order
+        factors = list(factors)
+        incident, neighbors = {}, {}
+        for index, (qubits, _) in enumerate(factors):
+            for i in qubits:
+                incident.setdefault(i, set()).add(index)
+                neighbors.setdefault(i, set()).update(qubits)
+        result = np.ones(num_samples, dtype=complex)
+        while len(incident) > 0:
+            variable = min(neighbors, key=lambda i: len(neighbors[i]))
+            remaining = tuple(i for i in neighbors.pop(variable) if i != variable)
+            label = {v: k + 1 for k, v in enumerate(remaining + (variable,))}
+            operands = []
+            for index in incident.pop(variable):
+                qubits, tensor = factors[index]
+                operands += [tensor, [0] + [label[i] for i in qubits]]
+                for i in qubits:
+                    if i != variable:
+                        incident[i].discard(index)
+            tensor = 0.5 * np.einsum(*operands, [0] + [label[i] for i in remaining])
+            if len(remaining) == 0:
+                result *= tensor
+                continue
+            factors.append((remaining, tensor))
+            for i in remaining:
+                incident[i].add(len(factors) - 1)
+                neighbors[i].discard(variable)
+                neighbors[i].update(remaining)
+        return result
+
+    def _build_lightcone(self) -> tuple[np.ndarray, int]:
+        # <Z_S> = sum_{T in S} cos(2b)^|S\T| (s sin(2b))^|T| <+|U^dag X_T Z_R U|+>, with s = i, R = S
+        # for the X mixer and s = -1, R = S \ T for the Y mixer; only terms t with |t & T| odd
+        # pick up a phase when X_T passes U = exp(-i gamma H), leaving a trigonometric polynomial
+        # in gamma of degree at most bound, recovered from 2 * bound + 1 samples
+        incident = {}
+        for index, (_, qubits) in enumerate(self.terms):
+            for i in qubits:
+                incident.setdefault(i, []).append(index)
+        max_size = max((len(qubits) for _, qubits in self.terms), default=0)
+        bound = 0
+        entries = []
+        for coeff, S in self.terms:
+            for size in range(1, len(S) + 1):
+                for T in combinations(S, size):
+                    candidates = sorted({index for i in T for index in incident[i]})
+                    odd_terms = [index for index in candidates if len(set(self.terms[index][1]) & set(T)) % 2 == 1]
+                    entries.append((coeff, S, T, odd_terms))
+                    bound = max(bound, sum(abs(self.terms[index][0]) for index in odd_terms))
+        num_samples = 2 * bound + 1
+        phases = np.exp(-2j * np.pi * np.arange(num_samples) / num_samples)
+        term_factors = [(qubits, self._term_factor(coeff, qubits, phases)) for coeff, qubits in self.terms]
+        sign_factor = np.tile(np.array([1.0, -1.0], dtype=complex), (num_samples, 1))
+        samples = np.zeros((max_size + 1, max_size + 1, num_samples), dtype=complex)
+        for coeff, S, T, odd_terms in entries:
+            # E_z[z_R exp(-2i gamma sum_t c_t z_t)] at gamma_j = pi * j / num_samples
+            R = S if self.mixer == "x" else tuple(i for i in S if i not in T)
+            factors = [term_factors[index] for index in odd_terms] + [((i,), sign_factor) for i in R]
+            phase = 1j ** len(T) if self.mixer == "x" else (-1) ** len(T)
+            samples[len(S) - len(T), len(T)] += phase * coeff * self._contract(factors, num_samples)
+        coeffs = np.roll(np.fft.ifft(samples, axis=-1), bound, axis=-1)
+        return coeffs, bound
+
+    def lightcone_energy(self, gamma: float, beta: float) -> float:
+        return float(self.lightcone_energies(np.array([gamma]), np.array([beta]))[0])
+
+    def lightcone_energies(self, gammas: np.ndarray, betas: np.ndarray) -> np.ndarray:
+        # p = 1 energies of parameter pairs (gammas[k], betas[k]), the light cone is built once
+        if self._lightcone_coeffs is None:
+            self._lightcone_coeffs = self._build_lightcone()
+        coeffs, bound = self._lightcone_coeffs
+        gammas, betas = np.asarray(gammas, dtype=float), np.asarray(betas, dtype=float)
+        frequencies = np.exp(-2j * np.multiply.outer(gammas, np.arange(-bound, bound + 1)))
+        in_gamma = np.einsum("abm,km->kab", coeffs, frequencies)
+        powers = np.arange(coeffs.shape[0])
+        cosines = np.cos(2 * betas)[:, None] ** powers
+        sines = np.sin(2 * betas)[:, None] ** powers
+        return np.einsum("kab,ka,kb->k", in_gamma, cosines, sines).real
+
+    def energy(self, gammas: list[float], betas: list[float], method: str = "auto") -> float:
+        if method == "auto":
+            method = "statevector" if self.num_qubits <= MAX_STATEVECTOR_QUBITS else "lightcone"
+        if method == "statevector":
+            return self.statevector_energy(gammas, betas)
+        if method == "lightcone":
+            if len(gammas) != 1 or len(betas) != 1:
+                raise ValueError("Light cone evaluation only supports a single QAOA layer.")
+            return self.lightcone_energy(gammas[0], betas[0])
+        raise ValueError(f"Unknown evaluation method: {method}")
+
+    def expected_unsatisfied(self, gammas: list[float], betas: list[float], method: str = "auto") -> float:
+        # with bit 1 as true, H = m - 8 * (number of unsatisfied clauses) for three literal clauses
+        if any(len(set(map(abs, clause))) != 3 for clause in self.hamiltonian.formula.clauses):
+            raise ValueError("Unsatisfied clause count requires clauses of three distinct variables.")
+        return (len(self.hamiltonian.formula.clauses) - self.energy(gammas, betas, method)) / 8.0
+
+    def grid_search(self, resolution: int = 64) -> tuple[float, float, float]:
+        # p = 1 minimum over gamma in [0, pi), beta in [0, pi / 2), the energy is periodic in both
+        gammas, betas = np.meshgrid(np.arange(resolution) * np.pi / resolution, np.arange(resolution) * np.pi / (2 * resolution), indexing="ij")
+        gammas, betas = gammas.ravel(), betas.ravel()
+        energies = self.lightcone_energies(gammas, betas)
+        best = int(np.argmin(energies))
+        return float(gammas[best]), float(betas[best]), float(energies[best])
@@ -1,6 +1,8 @@
 import random
-from heapq import heappush, heappop
+import time
+from heapq import heapify, heappush, heappop
 from pysat.formula import CNF
+import numpy as np
 
 random.seed()
 
@@ -14,29 +16,77 @@ def uniformly_random_independent_clauses(num_clauses: int, start_literal_id: int
         literal += 3
     return clauses
 
-def get_graph(formula: CNF) -> tuple[list[int], list[set[int]]]:
+def read_formula(filename: str) -> CNF:
+    # the SATLIB instances end with "%" and "0", which parse as an empty clause
+    formula = CNF(from_file=filename)
+    formula.clauses = [clause for clause in formula.clauses if len(clause) > 0]
+    return formula
+
+def _clause_incidence(formula: CNF) -> tuple[np.ndarray, np.ndarray]:
+    variables, clauses = [], []
+    for clause, literals in enumerate(formula.clauses):
+        clause_variables = set(map(abs, literals))
+        variables.extend(clause_variables)
+        clauses.extend([clause] * len(clause_variables))
+    return np.array(variables, dtype=np.int64), np.array(clauses, dtype=np.int64)
+
+def _get_csr_graph(formula: CNF) -> tuple[np.ndarray, np.ndarray]:
+    N = len(formula.clauses)
+    variables, clauses = _clause_incidence(formula)
+    order = np.argsort(variables, kind="stable")
+    variables, clauses = variables[order], clauses[order]
+    # every occurrence is paired with all occurrences of the same variable
+    group_start = np.searchsorted(variables, variables, side="left")
+    group_size = np.searchsorted(variables, variables, side="right") - group_start
+    first = np.repeat(np.arange(len(variables)), group_size)
+    second = np.repeat(group_start, group_size) + np.arange(group_size.sum()) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+    u, v = clauses[first], clauses[second]
+    edges = np.unique(u[u != v] * N + v[u != v])
+    indptr = np.zeros(N + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges // N, minlength=N), out=indptr[1:])
+    return indptr, edges % N
+
+def get_graph(formula: CNF, csr: bool = False) -> tuple[list[int], list[set[int]]] | tuple[np.ndarray, np.ndarray]:
+    if csr:
+        return _get_csr_graph(formula)
     N = len(formula.clauses)
     V = [i for i in range(N)]
     E = [set() for _ in range(N)]
-    for u in range(N):
-        for v in range(u + 1, N):
-            literal_set1 = set(map(abs, formula.clauses[u]))
-            literal_set2 = set(map(abs, formula.clauses[v]))
-            if len(literal_set1 & literal_set2) > 0:
+    occurrences = {}
+    for clause, literals in enumerate(formula.clauses):
+        for variable in set(map(abs, literals)):
+            occurrences.setdefault(variable, []).append(clause)
+    for clauses in occurrences.values():
+        for i, u in enumerate(clauses):
+            for v in clauses[i + 1:]:
                 E[u].add(v)
-                E[v].add(u) 
+                E[v].add(u)
     return V, E
 
-def _build_saturation_heap(uncolored: set[int], colored: set[int], edge_map: list[set[int]]) -> list[tuple[int, int, bool]]:
-    pass
+def _neighbors(graph: tuple) -> list:
+    first, second = graph
+    if isinstance(first, np.ndarray):
+        return [second[first[u]:first[u + 1]].tolist() for u in range(len(first) - 1)]
+    return second
+
+def _smallest_free_color(used_colors: set[int]) -> int:
+    color = 0
+    while color in used_colors:
+        color += 1
+    return color
+
+def _greedy_coloring(order: list[int], E: list) -> list[int]:
+    color_map = [None for _ in E]
+    for u in order:
+        color_map[u] = _smallest_free_color({color_map[v] for v in E[u] if color_map[v] is not None})
+    return color_map
 
-def get_color_map(formula: CNF) -> list[int]:
-    V, E = get_graph(formula)
-    color_map = [None for clause in formula.clauses]
+def _legacy_coloring(E: list) -> list[int]:
+    # colored neighbour count as priority, kept to reproduce earlier results
+    color_map = [None for _ in E]
     color_map[0] = 0
     colored = set([0])
-    uncolored = set(i for i in range(1, len(formula.clauses)))
-    num_colors = 1
+    uncolored = set(i for i in range(1, len(E)))
     while len(uncolored) > 0:
         chosen, curr_saturation = -1, -1
         for clause in uncolored:
@@ -47,17 +97,112 @@ def get_color_map(formula: CNF) -> list[int]:
             if saturation > curr_saturation:
                 chosen = clause
                 curr_saturation = saturation
-        colored_neighbors = filter(lambda v: color_map[v] is not None, E[chosen])
-        used_colors = list(map(lambda v: color_map[v], colored_neighbors))
-        used_colors.sort()
-        color_map[chosen] = used_colors[-1] + 1 if len(used_colors) > 0 else 0
-        prev_used_color = -1
-        for curr_used_color in used_colors:
-            if curr_used_color - prev_used_color > 1:
-                color_map[chosen] = prev_used_color + 1
-                break
-            prev_used_color = curr_used_color
+        used_colors = {color_map[v] for v in E[chosen] if color_map[v] is not None}
+        color_map[chosen] = _smallest_free_color(used_colors)
         colored.add(chosen)
         uncolored.remove(chosen)
-        num_colors = max(num_colors, color_map[chosen] + 1)
-    return num_colors, color_map
\ No newline at end of file
+    return color_map
+
+def _dsatur_coloring(E: list) -> list[int]:
+    color_map = [None for _ in E]
+    neighbor_colors = [set() for _ in E]
+    # max-heap on (saturation, degree), stale entries are skipped when popped
+    heap = [(0, -len(E[u]), u) for u in range(len(E))]
+    heapify(heap)
+    while heap:
+        saturation, _, u = heappop(heap)
+        if color_map[u] is not None or -saturation != len(neighbor_colors[u]):
+            continue
+        color = _smallest_free_color(neighbor_colors[u])
+        color_map[u] = color
+        for v in E[u]:
+            if color_map[v] is None and color not in neighbor_colors[v]:
+                neighbor_colors[v].add(color)
+                heappush(heap, (-len(neighbor_colors[v]), -len(E[v]), v))
+    return color_map
+
+def _largest_first_coloring(E: list) -> list[int]:
+    order = sorted(range(len(E)), key=lambda u: -len(E[u]))
+    return _greedy_coloring(order, E)
+
+def _rlf_coloring(E: list) -> list[int]:
+    color_map = [None for _ in E]
+    uncolored = set(range(len(E)))
+    color = 0
+    while uncolored:
+        degree = {u: sum(1 for v in E[u] if v in uncolored) for u in uncolored}
+        candidates = set(uncolored)
+        excluded_neighbors = dict.fromkeys(uncolored, 0)
+        # the class starts at the vertex of largest degree, then candidates adjacent to most
+        # excluded vertices are added first, ties go to fewer uncolored neighbours
+        selected = max(uncolored, key=lambda u: (degree[u], -u))
+        heap = [(0, degree[u], u) for u in uncolored if u != selected]
+        heapify(heap)
+        while selected is not None:
+            color_map[selected] = color
+            uncolored.remove(selected)
+            candidates.remove(selected)
+            for v in E[selected]:
+                if v not in candidates:
+                    continue
+                candidates.remove(v)
+                for w in E[v]:
+                    if w in candidates:
+                        excluded_neighbors[w] += 1
+                        heappush(heap, (-excluded_neighbors[w], degree[w], w))
+            selected = None
+            while heap:
+                count, _, u = heappop(heap)
+                if u in candidates and -count == excluded_neighbors[u]:
+                    selected = u
+                    break
+        color += 1
+    return color_map
+
+def _iterated_greedy(color_map: list[int], E: list, time_budget: float, lower_bound: int, rng: random.Random) -> list[int]:
+    # Culberson's iterated greedy: recoloring class by class never adds colors
+    best = color_map
+    best_num_colors = max(color_map) + 1
+    deadline = time.perf_counter() + time_budget
+    iteration = 0
+    while time.perf_counter() < deadline and best_num_colors > lower_bound:
+        classes = [[] for _ in range(max(color_map) + 1)]
+        for u, color in enumerate(color_map):
+            classes[color].append(u)
+        if iteration % 3 == 0:
+            classes.reverse()
+        elif iteration % 3 == 1:
+            classes.sort(key=len, reverse=True)
+        else:
+            rng.shuffle(classes)
+        color_map = _greedy_coloring([u for color_class in classes for u in color_class], E)
+        num_colors = max(color_map) + 1
+        if num_colors < best_num_colors:
+            best, best_num_colors = color_map, num_colors
+        iteration += 1
+    return best
+
+COLORING_STRATEGIES = {
+    "dsatur": _dsatur_coloring,
+    "largest_first": _largest_first_coloring,
+    "rlf": _rlf_coloring,
+    "legacy": _legacy_coloring,
+}
+
+def get_color_map(formula: CNF, graph: tuple | None = None, strategy: str = "dsatur", time_budget: float = 0.0,
+                  seed: int = 0) -> tuple[int, list[int]]:
+    if strategy not in COLORING_STRATEGIES:
+        raise ValueError(f"Unknown coloring strategy: {strategy}")
+    E = _neighbors(graph if graph is not None else get_graph(formula))
+    if len(E) == 0:
+        return 0, []
+    color_map = COLORING_STRATEGIES[strategy](E)
+    if time_budget > 0:
+        # clauses sharing a variable form a clique
+        occurrences = {}
+        for literals in formula.clauses:
+            for variable in set(map(abs, literals)):
+                occurrences[variable] = occurrences.get(variable, 0) + 1
+        # the seed fixes the shuffles, the time budget still bounds how many of them are tried
+        color_map = _iterated_greedy(color_map, E, time_budget, max(occurrences.values(), default=1), random.Random(seed))
+    return max(color_map) + 1, color_map